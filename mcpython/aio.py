@@ -0,0 +1,213 @@
+import asyncio
+import collections
+import sys
+from .connection import Connection, RequestError
+from .pipeline import PendingCall
+from .minecraft import Minecraft, CmdEntity, CmdPlayer
+
+""" asyncio client
+
+    AsyncConnection speaks the same line protocol as Connection over asyncio
+    streams.  Any number of requests may be in flight; replies are matched to
+    requests in the order they were sent.
+
+    AsyncMinecraft, AsyncCmdEntity and AsyncCmdPlayer expose the methods of
+    Minecraft, CmdEntity and CmdPlayer under the same names as coroutines.  They
+    run the regular command methods the same way mcpython.pipeline does, awaiting
+    each reply instead of blocking on it.
+
+        mc = await AsyncMinecraft.create("localhost", 4711)
+        pos = await AsyncCmdPlayer(mc.conn, "alice").getPos()
+        await mc.setBlock(pos.x, pos.y - 1, pos.z, "STONE")
+"""
+
+class AsyncPendingResponse:
+    """Result slot for a request sent with :func:`AsyncConnection.sendPipelined`. Awaitable."""
+    def __init__(self, future, command):
+        self.future = future
+        self.command = command
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+    def __await__(self):
+        return self.future.__await__()
+
+    def __repr__(self):
+        state = "done" if self.done else "pending"
+        return "AsyncPendingResponse(%s, %s)"%(self.command.strip(), state)
+
+class AsyncConnection:
+    """Connection to a Minecraft game built on asyncio streams"""
+    RequestFailed = Connection.RequestFailed
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.lastSent = b""
+        self._pending = collections.deque()
+        self._readTask = asyncio.ensure_future(self._readLoop())
+
+    @staticmethod
+    async def create(address = "localhost", port = 4711):
+        reader, writer = await asyncio.open_connection(address, port)
+        return AsyncConnection(reader, writer)
+
+    def send(self, f, *data):
+        """
+        Queues a request for sending. Note that a trailing newline '\n' is added here.
+        Await :func:`flush` to apply backpressure.
+        """
+        self._send(Connection._encode(f, data))
+
+    def sendMany(self, f, argsList):
+        """Queues command f once per argument tuple of argsList as a single write"""
+        self._send(b"".join(Connection._encode(f, data) for data in argsList))
+
+    def sendCommands(self, commands):
+        """Queues several commands, [(f, argument tuple), ...], in order as a single write"""
+        self._send(b"".join(Connection._encode(f, data) for f, data in commands))
+
+    def _send(self, s):
+        """The actual stream interaction from self.send, extracted for easier mocking and testing"""
+        self.lastSent = s
+        self.writer.write(s)
+
+    def sendPipelined(self, f, *data):
+        """
+        Sends a request without waiting for its reply
+
+        :return: an awaitable slot for the reply
+        :rtype: AsyncPendingResponse
+        """
+        self.send(f, *data)
+        future = asyncio.get_event_loop().create_future()
+        if self._readTask.done():
+            future.set_exception(ConnectionError("connection closed"))
+        pending = AsyncPendingResponse(future, self.lastSent)
+        self._pending.append(pending)
+        return pending
+
+    async def sendReceive(self, *data):
+        """Sends and receive data"""
+        return await self.sendPipelined(*data)
+
+    async def flush(self):
+        """Waits until the outgoing buffer has been handed to the operating system"""
+        await self.writer.drain()
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self._readTask.cancel()
+
+    async def _readLoop(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                s = line.rstrip(b"\n").rstrip(b"\r").decode("UTF-8", "replace")
+                if not self._pending:
+                    sys.stderr.write("Unexpected Data: <%s>\n"%s.strip())
+                    continue
+                pending = self._pending.popleft()
+                if pending.future.done():
+                    continue
+                if s == AsyncConnection.RequestFailed:
+                    pending.future.set_exception(RequestError("%s failed"%pending.command.strip()))
+                else:
+                    pending.future.set_result(s)
+        finally:
+            while self._pending:
+                future = self._pending.popleft().future
+                if not future.done():
+                    future.set_exception(ConnectionError("connection closed"))
+
+class AsyncPendingCall(PendingCall):
+    """A :class:`mcpython.pipeline.PendingCall` that awaits its replies"""
+    async def wait(self):
+        while not self.done:
+            await asyncio.wait([self.responses[-1].future])
+            self._step()
+
+    def result(self):
+        """Returns the outcome of a finished call; await :func:`wait` first"""
+        if not self.done:
+            raise asyncio.InvalidStateError("call has not finished")
+        return self._outcome()
+
+class _AsyncCommands:
+    """Exposes the methods of a command object as coroutines"""
+    def __init__(self, target):
+        self._target = target
+        self.conn = target.conn
+
+    async def _call(self, name, *args, **kwargs):
+        pending = AsyncPendingCall(self.conn, self._target, name, args, kwargs)
+        await pending.wait()
+        await self.conn.flush()
+        return pending.result()
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await self._call(name, *args, **kwargs)
+        return call
+
+class AsyncMinecraft(_AsyncCommands):
+    """
+    Coroutine version of :class:`mcpython.minecraft.Minecraft`
+
+    :param connection: an open connection
+    :type connection: AsyncConnection
+    """
+    def __init__(self, connection):
+        _AsyncCommands.__init__(self, Minecraft(connection))
+
+    @staticmethod
+    async def create(address = "localhost", port = 4711):
+        return AsyncMinecraft(await AsyncConnection.create(address, port))
+
+class AsyncCmdEntity(_AsyncCommands):
+    """
+    Coroutine version of :class:`mcpython.minecraft.CmdEntity`
+
+    :param conn: an open connection, usually AsyncMinecraft.conn
+    :type conn: AsyncConnection
+    :param id: entity id -- (default None)
+    :type id: int
+    """
+    def __init__(self, conn, id = None):
+        _AsyncCommands.__init__(self, CmdEntity(conn, id))
+
+class AsyncCmdPlayer(_AsyncCommands):
+    """
+    Coroutine version of :class:`mcpython.minecraft.CmdPlayer`
+
+    :param conn: an open connection, usually AsyncMinecraft.conn
+    :type conn: AsyncConnection
+    :param id: player id, can be integer or gamertag -- (default None)
+    :type id: str, int
+
+    :Note: A gamertag is resolved to an entity id on the first call.
+    """
+    def __init__(self, conn, id = None):
+        self._name = None
+        if isinstance(id, str) and id != "":
+            self._name = id
+            id = None
+        _AsyncCommands.__init__(self, CmdPlayer(conn, id))
+
+    async def _call(self, name, *args, **kwargs):
+        if self._name is not None:
+            self._target.id = await AsyncMinecraft(self.conn).getPlayerEntityId(self._name)
+            self._name = None
+        return await _AsyncCommands._call(self, name, *args, **kwargs)
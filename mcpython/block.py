@@ -23,6 +23,70 @@ class Block:
     def __repr__(self):
         return "Block(%d, %d)"%(self.id, self.data)
 
+class BlockState:
+    """
+    A block and its state properties, parsed from a world.getBlockWithData reply
+    such as "minecraft:oak_stairs[facing=east,half=bottom]".  Immutable; use
+    :func:`BlockState.parse`, which returns one shared object per distinct string.
+
+    material is the upper case Bukkit name ("OAK_STAIRS", as world.getBlock returns
+    it), properties a tuple of (name, value) string pairs in the server's order.
+    """
+    __slots__ = ("string", "namespace", "material", "properties")
+    _interned = {}
+
+    def __init__(self, string, namespace, material, properties):
+        init = object.__setattr__
+        init(self, "string", string)
+        init(self, "namespace", namespace)
+        init(self, "material", material)
+        init(self, "properties", properties)
+
+    @staticmethod
+    def parse(s):
+        """State string => BlockState, the same object for the same string"""
+        state = BlockState._interned.get(s)
+        if state is None:
+            state = BlockState._interned.setdefault(s, BlockState._parse(s))
+        return state
+
+    @staticmethod
+    def _parse(s):
+        name, bracket, props = s.partition("[")
+        namespace, colon, material = name.rpartition(":")
+        properties = ()
+        if bracket:
+            properties = tuple(tuple(p.partition("=")[::2]) for p in props.rstrip("]").split(",") if p)
+        return BlockState(s, namespace or "minecraft", material.upper(), properties)
+
+    def get(self, name, default = None):
+        """Value of the state property name, or default"""
+        for key, value in self.properties:
+            if key == name:
+                return value
+        return default
+
+    def __getitem__(self, name):
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __setattr__(self, name, value):
+        raise AttributeError("BlockState is immutable")
+
+    def __eq__(self, rhs):
+        return self is rhs or isinstance(rhs, BlockState) and self.string == rhs.string
+
+    def __hash__(self):
+        return hash(self.string)
+
+    def __str__(self):
+        return self.string
+
+    def __repr__(self):
+        return "BlockState(%r)"%self.string
+
 AIR                 = Block(0)
 STONE               = Block(1)
 GRASS               = Block(2)
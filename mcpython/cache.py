@@ -0,0 +1,438 @@
+import array
+import collections
+import math
+import threading
+import time
+from .util import flatten
+
+""" Client-side cache of world reads
+
+    Turned on with Minecraft.cacheWorld().  getBlock, getBlockWithData (and so
+    getBlockState) and getHeight answer from the cache when they can and store what
+    the server replies otherwise.  The cache is keyed by chunk: each chunk holds one
+    pair of compact arrays per 16 high section (material and state codes, uint16
+    each) and one array of column heights.  Entries older than ttl seconds are
+    refetched, and when more than maxChunks chunks are held the least recently used
+    one is dropped.
+
+    Every world.set* command sent through the connection invalidates the blocks it
+    writes, their neighbours (whose state, e.g. a fence's connections, may follow
+    the written block) and the heights of those columns; so do the positions of the
+    block hits returned by CmdEvents.pollBlockHits.  Restoring a checkpoint clears
+    the cache.  Changes made by players or by the game itself are only picked up once
+    entries expire.
+
+        cache = mc.cacheWorld(ttl = 2.0, prefetch = True)
+        ...
+        print(cache.stats())
+"""
+
+_Unknown = 0
+_NoHeight = -2 ** 31
+
+def baseConnections(conn):
+    """The Connection objects behind conn: itself, the sockets of a ConnectionPool or
+    the connection wrapped by a proxy such as TimeoutConnection => list"""
+    inner = getattr(conn, "conn", None)
+    if inner is not None:
+        return baseConnections(inner)
+    return list(getattr(conn, "connections", None) or [conn])
+
+class _Section:
+    """Codes of a 16x16x16 section, indexed y << 8 | z << 4 | x; 0 is not cached"""
+    __slots__ = ("time", "materials", "states")
+
+    def __init__(self, now):
+        self.time = now
+        self.materials = None
+        self.states = None
+
+class _Chunk:
+    __slots__ = ("sections", "heights", "heightsTime")
+
+    def __init__(self):
+        self.sections = {}
+        self.heights = None
+        self.heightsTime = 0.0
+
+class WorldCache:
+    """
+    Chunk-keyed cache of block materials, block states and column heights
+
+    :param ttl: seconds an entry stays valid, None keeps it until it is invalidated -- (default 5.0)
+    :type ttl: float
+    :param maxChunks: chunks kept before the least recently used one is dropped -- (default 256)
+    :type maxChunks: int
+    :param prefetch: on a getBlock miss read the whole 16x16x16 section with one
+        world.getBlocks, instead of the single block -- (default False)
+    :type prefetch: bool
+    """
+    WriteMargin = 1
+
+    def __init__(self, ttl = 5.0, maxChunks = 256, prefetch = False):
+        self.ttl = ttl
+        self.maxChunks = maxChunks
+        self.prefetch = prefetch
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.generation = 0
+        self._chunks = collections.OrderedDict()
+        self._names = [None]
+        self._codes = {}
+        self._lock = threading.Lock()
+
+    def attach(self, conn):
+        """Makes writes sent through conn (a Connection, ConnectionPool or proxy of one) invalidate the cache"""
+        for c in baseConnections(conn):
+            c.worldCache = self
+
+    def detach(self, conn):
+        for c in baseConnections(conn):
+            if c.worldCache is self:
+                c.worldCache = None
+
+    def token(self):
+        """Taken when a read is written to the server (see
+        :func:`mcpython.connection.Connection.sendRead`) and handed to the put method
+        with its reply, so a reply that may predate an invalidation is not stored"""
+        return self.generation
+
+    # -------------------------------------- LOOKUPS --------------------------------------
+
+    def block(self, x, y, z):
+        """Cached material of block (x,y,z) => str or None"""
+        return self._lookup("materials", x, y, z)
+
+    def state(self, x, y, z):
+        """Cached getBlockWithData reply of block (x,y,z) => str or None"""
+        return self._lookup("states", x, y, z)
+
+    def height(self, x, z):
+        """Cached height of column (x,z) => int or None"""
+        with self._lock:
+            heights = self._heights(x, z)
+            if heights is None:
+                return None
+            h = heights[(z & 15) << 4 | (x & 15)]
+            if h == _NoHeight:
+                return None
+            self.hits += 1
+            return h
+
+    def heights(self, x0, z0, x1, z1):
+        """Cached heights of the columns of a rectangle, x by x and z by z within each x
+        => [int or None]"""
+        out = []
+        with self._lock:
+            chunks = {}
+            for x in range(min(x0, x1), max(x0, x1) + 1):
+                for z in range(min(z0, z1), max(z0, z1) + 1):
+                    key = (x >> 4, z >> 4)
+                    heights = chunks.get(key, False)
+                    if heights is False:
+                        heights = chunks[key] = self._heights(x, z)
+                    h = _NoHeight if heights is None else heights[(z & 15) << 4 | (x & 15)]
+                    out.append(None if h == _NoHeight else h)
+            self.hits += len(out) - out.count(None)
+        return out
+
+    def _heights(self, x, z):
+        chunk = self._chunk(x, z, False)
+        if chunk is None or chunk.heights is None:
+            return None
+        if self.ttl is not None and time.monotonic() - chunk.heightsTime > self.ttl:
+            chunk.heights = None
+            self.expirations += 1
+            return None
+        return chunk.heights
+
+    def _lookup(self, kind, x, y, z):
+        with self._lock:
+            chunk = self._chunk(x, z, False)
+            if chunk is None:
+                return None
+            section = self._section(chunk, y >> 4, False)
+            if section is None:
+                return None
+            codes = getattr(section, kind)
+            if codes is None:
+                return None
+            code = codes[(y & 15) << 8 | (z & 15) << 4 | (x & 15)]
+            if code == _Unknown:
+                return None
+            self.hits += 1
+            return self._names[code]
+
+    def blocks(self, x0, y0, z0, x1, y1, z1):
+        """Cached materials of a cuboid, in world.getBlocks (y, x, z) order => [str or None]"""
+        return self._cuboid("materials", x0, y0, z0, x1, y1, z1)
+
+    def states(self, x0, y0, z0, x1, y1, z1):
+        """Cached getBlockWithData replies of a cuboid, in world.getBlocks (y, x, z) order
+        => [str or None]"""
+        return self._cuboid("states", x0, y0, z0, x1, y1, z1)
+
+    def _cuboid(self, kind, x0, y0, z0, x1, y1, z1):
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        z0, z1 = min(z0, z1), max(z0, z1)
+        names = self._names
+        out = []
+        with self._lock:
+            sections = {}
+            for y in range(y0, y1 + 1):
+                for x in range(x0, x1 + 1):
+                    for z in range(z0, z1 + 1):
+                        key = (x >> 4, y >> 4, z >> 4)
+                        codes = sections.get(key, False)
+                        if codes is False:
+                            chunk = self._chunk(x, z, False)
+                            section = None if chunk is None else self._section(chunk, y >> 4, False)
+                            codes = sections[key] = None if section is None else getattr(section, kind)
+                        code = _Unknown if codes is None else codes[(y & 15) << 8 | (z & 15) << 4 | (x & 15)]
+                        out.append(names[code])
+            self.hits += len(out) - out.count(None)
+        return out
+
+    # -------------------------------------- STORES --------------------------------------
+
+    def putBlock(self, x, y, z, material, token):
+        self._put("materials", x, y, z, material, token)
+
+    def putState(self, x, y, z, state, token):
+        self._put("states", x, y, z, state, token)
+
+    def putHeight(self, x, z, h, token):
+        with self._lock:
+            self.misses += 1
+            if token != self.generation:
+                return
+            chunk = self._chunk(x, z, True)
+            if chunk.heights is None:
+                chunk.heights = array.array("i", [_NoHeight]) * 256
+                chunk.heightsTime = time.monotonic()
+            chunk.heights[(z & 15) << 4 | (x & 15)] = h
+
+    def putSection(self, x, y, z, materials, token):
+        """
+        Stores the materials of the whole section holding block (x,y,z)
+
+        :param materials: the 4096 material names, in world.getBlocks (y, x, z) order
+        """
+        with self._lock:
+            self.misses += 1
+            if token != self.generation:
+                return
+            codes = [self._code(name) for name in materials]
+            if token != self.generation:
+                return
+            chunk = self._chunk(x, z, True)
+            section = chunk.sections[y >> 4] = _Section(time.monotonic())
+            section.materials = blocks = array.array("H", bytes(8192))
+            i = 0
+            for ly in range(16):
+                for lx in range(16):
+                    for lz in range(16):
+                        blocks[ly << 8 | lz << 4 | lx] = codes[i]
+                        i += 1
+
+    def putCuboid(self, x0, y0, z0, x1, y1, z1, material, token):
+        """Stores one material for every block of a cuboid, e.g. what a world.setBlocks wrote"""
+        with self._lock:
+            if token != self.generation:
+                return
+            code = self._code(material)
+            if token != self.generation:
+                return
+            self._fill(x0, y0, z0, x1, y1, z1, code)
+
+    def _put(self, kind, x, y, z, value, token):
+        with self._lock:
+            self.misses += 1
+            if token != self.generation:
+                return
+            code = self._code(value)
+            if token != self.generation:
+                return
+            chunk = self._chunk(x, z, True)
+            section = self._section(chunk, y >> 4, True)
+            codes = getattr(section, kind)
+            if codes is None:
+                codes = array.array("H", bytes(8192))
+                setattr(section, kind, codes)
+            codes[(y & 15) << 8 | (z & 15) << 4 | (x & 15)] = code
+
+    def _code(self, name):
+        code = self._codes.get(name)
+        if code is None:
+            if len(self._names) > 0xFFFF:
+                # codes are uint16, start over rather than grow them
+                self._clear()
+            code = self._codes[name] = len(self._names)
+            self._names.append(name)
+        return code
+
+    def _chunk(self, x, z, create):
+        key = (x >> 4, z >> 4)
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+        elif create:
+            chunk = self._chunks[key] = _Chunk()
+            while len(self._chunks) > self.maxChunks:
+                self._chunks.popitem(last = False)
+                self.evictions += 1
+        return chunk
+
+    def _section(self, chunk, sy, create):
+        section = chunk.sections.get(sy)
+        if section is not None and self.ttl is not None and time.monotonic() - section.time > self.ttl:
+            del chunk.sections[sy]
+            self.expirations += 1
+            section = None
+        if section is None and create:
+            section = chunk.sections[sy] = _Section(time.monotonic())
+        return section
+
+    # -------------------------------------- INVALIDATION --------------------------------------
+
+    def sent(self, f, data):
+        """Called by the connection for every command it sends; invalidates what world.set* commands write"""
+        if not f.startswith(b"world.set") or f == b"world.setting":
+            if f == b"world.checkpoint.restore":
+                # the whole world may have changed
+                self.clear()
+            return
+        n = 6 if f == b"world.setBlocks" else 3
+        # commands are usually sent as (args,) with plain numbers leading args
+        values = data[0] if len(data) == 1 and type(data[0]) in (tuple, list) else data
+        try:
+            coords = [v if type(v) is int else math.floor(v) for v in values[:n]]
+        except TypeError:
+            coords = self._coords(data, n)
+        if len(coords) < n:
+            # no idea what was written
+            self.clear()
+            return
+        if n == 3:
+            coords = coords * 2
+        m = WorldCache.WriteMargin
+        x0, y0, z0, x1, y1, z1 = coords
+        self.invalidate(min(x0, x1) - m, min(y0, y1) - m, min(z0, z1) - m,
+                        max(x0, x1) + m, max(y0, y1) + m, max(z0, z1) + m)
+
+    @staticmethod
+    def _coords(data, n):
+        coords = []
+        try:
+            for v in flatten(data):
+                coords.append(math.floor(v))
+                if len(coords) == n:
+                    break
+        except (TypeError, ValueError):
+            return ()
+        return coords
+
+    def invalidateBlocks(self, positions):
+        """Forgets the blocks at positions [(x,y,z), ...] and the heights of their columns"""
+        for x, y, z in positions:
+            self.invalidate(x, y, z, x, y, z)
+
+    def invalidate(self, x0, y0, z0, x1, y1, z1):
+        """Forgets the blocks of a cuboid and the heights of its columns"""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        z0, z1 = min(z0, z1), max(z0, z1)
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            if self._chunks:
+                self._fill(x0, y0, z0, x1, y1, z1, _Unknown)
+
+    def _fill(self, x0, y0, z0, x1, y1, z1, code):
+        """Sets the material codes of a cuboid, code _Unknown forgets them.  Either way
+        the states of the cuboid and the heights of its columns are forgotten."""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        z0, z1 = min(z0, z1), max(z0, z1)
+        cx0, cx1, cz0, cz1 = x0 >> 4, x1 >> 4, z0 >> 4, z1 >> 4
+        if code == _Unknown and (cx1 - cx0 + 1) * (cz1 - cz0 + 1) > len(self._chunks):
+            # forgetting a large area: only visit the chunks held
+            keys = [key for key in self._chunks if cx0 <= key[0] <= cx1 and cz0 <= key[1] <= cz1]
+        else:
+            keys = [(cx, cz) for cx in range(cx0, cx1 + 1) for cz in range(cz0, cz1 + 1)]
+        for cx, cz in keys:
+            chunk = self._chunk(cx << 4, cz << 4, code != _Unknown)
+            if chunk is not None:
+                self._fillChunk(chunk, max(x0, cx << 4) & 15, min(x1, cx << 4 | 15) & 15,
+                                y0, y1, max(z0, cz << 4) & 15, min(z1, cz << 4 | 15) & 15, code)
+
+    def _fillChunk(self, chunk, lx0, lx1, y0, y1, lz0, lz1, code):
+        width = lx1 - lx0 + 1
+        if chunk.heights is not None:
+            noHeights = array.array("i", [_NoHeight]) * width
+            for lz in range(lz0, lz1 + 1):
+                chunk.heights[(lz << 4) + lx0:(lz << 4) + lx1 + 1] = noHeights
+        whole = width == 16 and lz0 == 0 and lz1 == 15
+        unknown = array.array("H", bytes(2 * width))
+        row = array.array("H", [code]) * width
+        if code == _Unknown:
+            layers = [sy for sy in chunk.sections if y0 >> 4 <= sy <= y1 >> 4]
+        else:
+            layers = range(y0 >> 4, (y1 >> 4) + 1)
+        for sy in layers:
+            ly0 = max(y0, sy << 4) & 15
+            ly1 = min(y1, sy << 4 | 15) & 15
+            if code == _Unknown and whole and ly0 == 0 and ly1 == 15:
+                del chunk.sections[sy]
+                continue
+            section = self._section(chunk, sy, code != _Unknown)
+            if section is None:
+                continue
+            if code != _Unknown and section.materials is None:
+                section.materials = array.array("H", bytes(8192))
+            for codes, value in ((section.materials, row), (section.states, unknown)):
+                if codes is None:
+                    continue
+                for ly in range(ly0, ly1 + 1):
+                    for lz in range(lz0, lz1 + 1):
+                        i = ly << 8 | lz << 4
+                        codes[i + lx0:i + lx1 + 1] = value
+
+    def clear(self):
+        """Forgets everything"""
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self.generation += 1
+        self.invalidations += 1
+        self._chunks.clear()
+        self._names = [None]
+        self._codes = {}
+
+    # -------------------------------------- STATS --------------------------------------
+
+    def stats(self):
+        """
+        :return: {"hits", "misses", "hitRate", "evictions", "expirations", "invalidations", "chunks", "sections"}
+        :rtype: dict
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "chunks": len(self._chunks),
+                "sections": sum(len(chunk.sections) for chunk in self._chunks.values()),
+            }
+
+    def __repr__(self):
+        return "WorldCache(chunks=%d, hits=%d, misses=%d)"%(len(self._chunks), self.hits, self.misses)
@@ -1,29 +1,630 @@
 import socket
-import select
 import sys
+import collections
+import threading
+import time
+import weakref
 from .util import flatten_parameters_to_bytestring
+from .metrics import Metrics
+from .rate import RateController
 
 """ @author: Aron Nieminen, Mojang AB"""
 
 class RequestError(Exception):
     pass
 
+class RequestTimeout(RequestError):
+    """The reply to a request did not arrive in time; the late reply is discarded"""
+    pass
+
+class BinaryReply(bytes):
+    """
+    A reply sent as a binary frame instead of a line of text.  On the wire a frame is 
+    a NUL byte, the payload length as a 4 byte big endian integer, then the payload; 
+    text replies never contain NUL, so the two cannot be confused.  Only servers that 
+    announce a binary capability (see :func:`Connection.capabilities`) send frames, 
+    and only for the requests made for them.
+    """
+    pass
+
+def binaryFrame(payload):
+    """Wraps payload bytes in a binary reply frame"""
+    return b"\x00" + len(payload).to_bytes(4, "big") + payload
+
+class LineReader:
+    """
+    Frames the incoming byte stream of a socket into newline terminated responses.
+
+    One reader lives as long as its connection, so bytes received past the end of
+    one response are kept for the next one instead of being thrown away.  Complete
+    responses are queued in arrival order.  Binary frames are queued as 
+    :class:`BinaryReply` objects.
+    """
+    def __init__(self, sock, bufsize = 65536):
+        self.socket = sock
+        self.bufsize = bufsize
+        self._buffer = bytearray()
+        self._scanned = 0
+        self._lines = collections.deque()
+
+    def __len__(self):
+        """Number of complete responses already queued"""
+        return len(self._lines)
+
+    def feed(self, data):
+        """Appends received bytes to the buffer and queues any completed lines"""
+        buffer = self._buffer
+        buffer += data
+        while buffer:
+            if buffer[0] == 0:
+                # a binary frame
+                if len(buffer) < 5:
+                    return
+                end = 5 + int.from_bytes(buffer[1:5], "big")
+                if len(buffer) < end:
+                    return
+                self._lines.append(BinaryReply(buffer[5:end]))
+                del buffer[:end]
+                self._scanned = 0
+                continue
+            # buffer[:self._scanned] holds neither a newline nor a NUL, only search the rest
+            frame = buffer.find(b"\x00", self._scanned)
+            stop = len(buffer) if frame < 0 else frame
+            end = buffer.rfind(b"\n", self._scanned, stop)
+            if end < 0:
+                self._scanned = stop
+                return
+            lines = bytes(buffer[:end]).split(b"\n")
+            del buffer[:end + 1]
+            self._scanned = stop - end - 1
+            self._lines.extend(lines)
+            if frame < 0:
+                return
+
+    def fill(self):
+        """
+        Reads once from the socket
+
+        :return: False once the peer has closed the connection
+        :rtype: bool
+        """
+        data = self.socket.recv(self.bufsize)
+        if not data:
+            return False
+        self.feed(data)
+        return True
+
+    def pop(self):
+        """Returns the next queued response, or None if no complete response is queued"""
+        if not self._lines:
+            return None
+        return self._decode(self._lines.popleft())
+
+    def readline(self):
+        """
+        Returns the next response with the trailing newline trimmed, blocking until
+        one is complete.  Returns "" if the connection is closed first.
+        """
+        while not self._lines:
+            if not self.fill():
+                return ""
+        return self._decode(self._lines.popleft())
+
+    def readlines(self, n):
+        """Returns the next n responses in the order they were received"""
+        return [self.readline() for _ in range(n)]
+
+    def takeAll(self):
+        """Removes and returns every queued response plus any incomplete trailing data"""
+        lines = [self._decode(l) for l in self._lines]
+        self._lines.clear()
+        if self._buffer:
+            lines.append(self._decode(bytes(self._buffer)))
+            del self._buffer[:]
+            self._scanned = 0
+        return lines
+
+    @staticmethod
+    def _decode(line):
+        if line.__class__ is BinaryReply:
+            return line
+        return line.rstrip(b"\r").decode("UTF-8", "replace")
+
+class PendingResponse:
+    """
+    Result slot for a request sent with :func:`Connection.sendPipelined`.
+
+    The connection's reader thread fills in the reply when it arrives; replies are
+    matched to requests in the order the requests were sent.  A request that is 
+    cancelled (or times out) keeps its place in that order, so its reply is still 
+    consumed and thrown away when it arrives and later replies stay matched.
+
+    When the connection has a world cache, self.token is the cache generation at the 
+    time the request was written (see :func:`mcpython.cache.WorldCache.token`).
+    """
+    def __init__(self, conn, command, key = None):
+        self.conn = conn
+        self.command = command
+        self.key = key
+        self.token = None
+        self.sequence = None
+        self.sentAt = 0.0
+        self.receivedAt = 0.0
+        self.done = False
+        self.cancelled = False
+        self._value = None
+        self._error = None
+        self._event = threading.Event()
+
+    def _set(self, s):
+        if self.cancelled:
+            return
+        if s == Connection.RequestFailed:
+            self._error = RequestError("%s failed"%self.command.strip())
+        else:
+            self._value = s
+        self.receivedAt = time.perf_counter()
+        self.done = True
+        self._event.set()
+
+    def _fail(self, error):
+        if self.cancelled:
+            return
+        self._error = error
+        self.receivedAt = time.perf_counter()
+        self.done = True
+        self._event.set()
+
+    def wait(self, timeout = None):
+        """
+        Blocks until the reply for this request has been read
+
+        :param timeout: seconds to wait at most -- (default None, the connection's timeout)
+        :type timeout: float
+
+        :return: whether the request is done
+        :rtype: bool
+        """
+        if not self.done:
+            self.conn.flush()
+            self._event.wait(self.conn.timeout if timeout is None else timeout)
+        return self.done
+
+    def cancel(self, error = None):
+        """
+        Gives up on the reply.  It is discarded when it arrives.
+
+        :param error: raised by :func:`result` from now on -- (default RequestError)
+        :type error: Exception
+
+        :return: False if the reply had already arrived
+        :rtype: bool
+        """
+        with self.conn._readLock:
+            if self.done:
+                return False
+            self.cancelled = True
+            self._error = error or RequestError("%s cancelled"%self.command.strip())
+            self.done = True
+        self._event.set()
+        return True
+
+    def result(self, timeout = None):
+        """
+        :param timeout: seconds to wait at most -- (default None, the connection's timeout)
+        :type timeout: float
+
+        :return: the reply with the trailing newline trimmed
+        :rtype: str
+
+        :raises RequestError: if the server answered with a failure
+        :raises RequestTimeout: if the reply did not arrive within timeout seconds
+        """
+        if not self.wait(timeout):
+            self.cancel(RequestTimeout("%s timed out"%self.command.strip()))
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def __repr__(self):
+        state = "done" if self.done else "pending"
+        return "PendingResponse(%s, %s)"%(self.command.strip(), state)
+
 class Connection:
-    """Connection to a Minecraft Pi game"""
+    """
+    Connection to a Minecraft Pi game
+
+    A background thread owns the read side of the socket.  It hands every reply to 
+    the oldest request still waiting for one.  Data that arrives while no request is 
+    waiting is kept in self.unexpected (the most recent UnexpectedLimit lines) and 
+    counted in self.unexpectedCount and self.unexpectedBytes.
+
+    A connection can be shared between threads.  Registering a request in the queue 
+    of requests waiting for a reply and writing it to the socket happen together 
+    under one lock, so the queue is always in the order the server sees the requests 
+    and every thread gets its own reply.  The lock is held only for the write, not 
+    for the round trip, so concurrent sendReceive calls are pipelined.  
+    :func:`receive` on its own cannot tell whose reply it is reading; use 
+    :func:`sendReceive` or :func:`sendPipelined` from threads.
+
+    See :func:`autoReconnect` for surviving server restarts and dropped connections.
+    When self.worldCache is set (see :func:`mcpython.minecraft.Minecraft.cacheWorld`) 
+    every command sent is passed to it, so world writes invalidate cached reads.
+    When self.writeFilter is set (see :func:`mcpython.minecraft.Minecraft.filterWrites`) 
+    :func:`send` lets it drop or shrink writes that would not change the world.
+
+    :param timeout: seconds to wait for a reply before raising :class:`RequestTimeout` 
+        -- (default None, wait forever).  Can be changed later through self.timeout; 
+        single calls can pass their own timeout.
+    :type timeout: float
+    """
     RequestFailed = "Fail"
+    UnexpectedLimit = 1000
+    CapabilitiesCommand = b"mcpython.capabilities"
+    CapabilityTimeout = 2.0
+    BinaryBlocks = "blocks.binary"
+    _prefixes = {}
 
-    def __init__(self, address, port):
+    def __init__(self, address, port, timeout = None):
+        self.address = address
+        self.port = port
+        self.timeout = timeout
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.socket.connect((address, port))
+        self.reader = LineReader(self.socket)
         self.lastSent = ""
+        self.closed = False
+        self.reconnects = 0
+        self.outbox = None
+        self.outboxDropped = 0
+        self._sequence = 0
+        self.reconnectAttempts = 0
+        self.reconnectBackoff = 0.5
+        self.reconnectMaxBackoff = 30.0
+        self._reconnectHooks = []
+        self._pruneHooksAt = 16
+        self._closing = False
+        self.metrics = None
+        self.rateController = None
+        self.worldCache = None
+        self.writeFilter = None
+        self._capabilities = None
+        self.unexpected = collections.deque(maxlen = Connection.UnexpectedLimit)
+        self.unexpectedCount = 0
+        self.unexpectedBytes = 0
+        self._pending = collections.deque()
+        self._readLock = threading.Lock()
+        self.coalesceBytes = 0
+        self.coalesceDelay = 0.0
+        self._outgoing = bytearray()
+        self._flushTimer = None
+        self._writeLock = threading.RLock()
+        self._startReader()
+
+    def _startReader(self):
+        self._readThread = threading.Thread(target = self._readLoop, args = (self.socket, self.reader), 
+                                            name = "mcpython-reader", daemon = True)
+        self._readThread.start()
+
+    def close(self):
+        """Flushes any coalesced commands and closes the socket"""
+        self.flush()
+        self._closing = True
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+        self._readThread.join(1.0)
+
+    def autoReconnect(self, enabled = True, attempts = 10, backoff = 0.5, maxBackoff = 30.0, outboxSize = 10000):
+        """
+        Turns automatic reconnection on or off.  While it is on, a dropped connection 
+        (server restart, network failure) is reopened, waiting backoff seconds before 
+        the first attempt and doubling the wait up to maxBackoff after each failure.
+
+        Commands are kept in a bounded outbox until a later reply shows that the server 
+        has processed them.  After reconnecting, the outbox is sent again in order, so 
+        fire-and-forget commands (setBlock, setPos, ...) and requests still waiting for 
+        a reply are not lost.  Then the hooks added with :func:`addReconnectHook` run to 
+        restore session state, e.g. :class:`mcpython.minecraft.CmdPlayer` looks up its 
+        player's entity id again.
+
+        :param enabled: reconnect automatically -- (default True)
+        :type enabled: bool
+        :param attempts: connection attempts before giving up -- (default 10)
+        :type attempts: int
+        :param backoff: first wait between attempts in seconds -- (default 0.5)
+        :type backoff: float
+        :param maxBackoff: longest wait between attempts in seconds -- (default 30.0)
+        :type maxBackoff: float
+        :param outboxSize: most unacknowledged commands kept for replay -- (default 10000)
+        :type outboxSize: int
+
+        :Note: When more than outboxSize commands are sent without a reply, the oldest 
+            ones can no longer be replayed; self.outboxDropped counts them.
+        """
+        with self._writeLock:
+            if enabled:
+                self.outbox = collections.deque(self.outbox or (), maxlen = outboxSize)
+            else:
+                self.outbox = None
+            self.reconnectAttempts = attempts if enabled else 0
+            self.reconnectBackoff = backoff
+            self.reconnectMaxBackoff = maxBackoff
+
+    def enableMetrics(self, metrics = None):
+        """
+        Starts recording per-command counts, bytes, failures and latencies
+
+        :param metrics: store to record into, e.g. one shared by several connections -- (default None, a new one)
+        :type metrics: mcpython.metrics.Metrics
+
+        :return: the store, see :class:`mcpython.metrics.Metrics` for snapshots and export
+        :rtype: mcpython.metrics.Metrics
+        """
+        self.metrics = metrics or Metrics()
+        return self.metrics
+
+    def rateLimit(self, enabled = True, **options):
+        """
+        Turns adaptive rate control on or off.  While it is on, every command waits 
+        for a token from a :class:`mcpython.rate.RateController` whose rate follows the 
+        server's measured backlog, so bulk streams (setBlock, setBlocks, ...) run just 
+        below the rate the server can keep up with.
+
+        :param enabled: pace commands -- (default True)
+        :type enabled: bool
+        :param options: passed to :class:`mcpython.rate.RateController`, e.g. rate, maxRate
+
+        :return: the controller; read its rate, set ceilings with setCeiling
+        :rtype: mcpython.rate.RateController
+        """
+        self.rateController = RateController(self, **options) if enabled else None
+        return self.rateController
+
+    def capabilities(self):
+        """
+        Asks the server once which optional protocol features it supports, e.g. 
+        Connection.BinaryBlocks for binary block transfers.  A server that answers 
+        "Fail", or does not answer within CapabilityTimeout seconds, supports none 
+        and the plain text protocol is used.  In the latter case the socket is 
+        replaced by a new connection, since a late answer would otherwise be taken 
+        for the reply to the next request; requests still waiting for a reply then 
+        fail with ConnectionError unless :func:`autoReconnect` is on.
+
+        :return: names of the supported features
+        :rtype: frozenset
+        """
+        capabilities = self._capabilities
+        if capabilities is None:
+            timeout = Connection.CapabilityTimeout
+            if self.timeout is not None:
+                timeout = min(timeout, self.timeout)
+            probe = self.sendPipelined(Connection.CapabilitiesCommand)
+            try:
+                s = probe.result(timeout)
+            except RequestTimeout:
+                self._resync(probe)
+                s = ""
+            except RequestError:
+                s = ""
+            capabilities = self._capabilities = frozenset(c for c in s.split(",") if c)
+        return capabilities
+
+    def addReconnectHook(self, callback):
+        """
+        Registers callback() to be run after each automatic reconnection.  Bound methods 
+        are held weakly, so registering does not keep their object alive.
+        """
+        hooks = self._reconnectHooks
+        if len(hooks) >= self._pruneHooksAt:
+            # drop the hooks of objects that are gone, e.g. short-lived CmdPlayers
+            hooks[:] = [ref for ref in hooks if ref() is not None]
+            self._pruneHooksAt = max(16, 2 * len(hooks))
+        if hasattr(callback, "__self__"):
+            hooks.append(weakref.WeakMethod(callback))
+        else:
+            hooks.append(lambda: callback)
+
+    def _record(self, s, pending):
+        """Keeps a sent command in the outbox until it is acknowledged"""
+        outbox = self.outbox
+        if outbox is not None:
+            self._sequence += 1
+            if pending is not None:
+                pending.sequence = self._sequence
+            if len(outbox) == outbox.maxlen:
+                self.outboxDropped += 1
+            outbox.append((self._sequence, s, pending))
+
+    def _acknowledge(self, pending):
+        """A reply to pending means everything sent up to it has been processed"""
+        outbox = self.outbox
+        sequence = pending.sequence
+        if outbox is not None and sequence is not None:
+            # by sequence number, pending itself may have been pushed out already
+            while outbox and outbox[0][0] <= sequence:
+                outbox.popleft()
+
+    def _resync(self, stale):
+        """Replaces the socket with a new connection, so the reply to the stale request
+        can no longer arrive => whether a new socket is in place"""
+        with self._writeLock:
+            outbox = self.outbox
+            if outbox is not None:
+                # replaying it would leave the stream out of step again
+                kept = [entry for entry in outbox if entry[2] is not stale]
+                outbox.clear()
+                outbox.extend(kept)
+            sock = self.socket
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            return self._reconnect(sock, resync = True)
+
+    def _reconnect(self, failed, resync = False):
+        """
+        Replaces the failed socket with a new connection and replays the outbox
+
+        :param resync: reconnect right away, even when automatic reconnection is off
+        :type resync: bool
+
+        :return: True once a working socket is in place
+        :rtype: bool
+        """
+        with self._writeLock:
+            if self.socket is not failed:
+                return not self.closed
+            if self._closing or not (self.reconnectAttempts or resync):
+                return False
+            delay = 0.0 if resync else self.reconnectBackoff
+            for attempt in range(self.reconnectAttempts or 1):
+                time.sleep(delay)
+                try:
+                    sock = socket.create_connection((self.address, self.port))
+                    break
+                except OSError:
+                    delay = min(delay * 2, self.reconnectMaxBackoff) or self.reconnectBackoff
+            else:
+                return False
+            try:
+                failed.close()
+            except OSError:
+                pass
+            self.socket = sock
+            self.reader = LineReader(sock)
+            self.reconnects += 1
+            self._capabilities = None
+            del self._outgoing[:]
+            replay = list(self.outbox or ())
+            replayed = set(id(p) for _, _, p in replay if p is not None)
+            with self._readLock:
+                lost = [p for p in self._pending if id(p) not in replayed]
+                for p in lost:
+                    self._pending.remove(p)
+            for p in lost:
+                p._fail(ConnectionError("connection lost"))
+            self._startReader()
+            if replay:
+                s = b"".join(s for _, s, _ in replay)
+                self.lastSent = s
+                sock.sendall(s)
+        for ref in list(self._reconnectHooks):
+            hook = ref()
+            if hook is None:
+                self._reconnectHooks.remove(ref)
+            else:
+                hook()
+        return True
+
+    def _readLoop(self, sock, reader):
+        """Body of the reader thread"""
+        error = None
+        try:
+            while reader.fill():
+                s = reader.pop()
+                while s is not None:
+                    self._dispatch(s)
+                    s = reader.pop()
+        except OSError:
+            pass
+        except Exception as e:
+            # a failing dispatch, hook or metrics store: the reply stream is lost, so 
+            # rather than reconnecting fail everything waiting with the error
+            error = e
+        if error is None and self._reconnect(sock):
+            return
+        with self._writeLock:
+            if self.socket is not sock:
+                return
+            with self._readLock:
+                self.closed = True
+                pending = list(self._pending)
+                self._pending.clear()
+            if error is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            for p in pending:
+                p._fail(error or ConnectionError("connection closed"))
+
+    def _dispatch(self, s):
+        """Hands a reply to the oldest waiting request, or files it as unexpected"""
+        with self._readLock:
+            if self._pending:
+                pending = self._pending.popleft()
+            else:
+                self.unexpected.append(s)
+                self.unexpectedCount += 1
+                self.unexpectedBytes += len(s) + 1
+                return
+        self._acknowledge(pending)
+        if self.metrics is not None and pending.key is not None:
+            self.metrics.recordReply(pending.key, len(s) + 1, time.perf_counter() - pending.sentAt, 
+                                     s == Connection.RequestFailed)
+        pending._set(s)
+
+    def _expect(self, pending):
+        """Registers pending as the next request waiting for a reply"""
+        with self._readLock:
+            if self.closed:
+                pending._fail(ConnectionError("connection closed"))
+            else:
+                self._pending.append(pending)
+
+    def coalesce(self, enabled = True, maxBytes = 65536, maxDelay = 0.05):
+        """
+        Turns write coalescing on or off.  While it is on, commands sent with 
+        :func:`send` (which get no reply, e.g. setBlock or postToChat) are collected 
+        in a buffer and written with a single sendall once maxBytes have been 
+        collected, maxDelay seconds after the first buffered command, or right before 
+        the next request that expects a reply - whichever comes first.
+
+        :param enabled: coalesce writes -- (default True)
+        :type enabled: bool
+        :param maxBytes: flush threshold in bytes -- (default 65536)
+        :type maxBytes: int
+        :param maxDelay: longest time a command may wait in the buffer in seconds -- (default 0.05)
+        :type maxDelay: float
+        """
+        self.flush()
+        self.coalesceBytes = maxBytes if enabled else 0
+        self.coalesceDelay = maxDelay
+
+    def flush(self):
+        """Writes out any coalesced commands"""
+        with self._writeLock:
+            if self._flushTimer is not None:
+                self._flushTimer.cancel()
+                self._flushTimer = None
+            if self._outgoing:
+                s = bytes(self._outgoing)
+                del self._outgoing[:]
+                self._send(s)
+
+    def _write(self, s, flush):
+        """Writes s directly, or through the coalescing buffer when that is on"""
+        if not self.coalesceBytes:
+            self._send(s)
+            return
+        with self._writeLock:
+            self._outgoing += s
+            if flush or len(self._outgoing) >= self.coalesceBytes:
+                self.flush()
+            elif self._flushTimer is None and self.coalesceDelay > 0:
+                self._flushTimer = threading.Timer(self.coalesceDelay, self.flush)
+                self._flushTimer.daemon = True
+                self._flushTimer.start()
 
     def drain(self):
-        """Drains the socket of incoming data"""
-        while True:
-            readable, _, _ = select.select([self.socket], [], [], 0.0)
-            if not readable:
-                break
-            data = self.socket.recv(1500)
+        """Reports and discards the unexpected data received so far"""
+        with self._readLock:
+            unexpected = list(self.unexpected)
+            self.unexpected.clear()
+        for data in unexpected:
             e =  "Drained Data: <%s>\n"%data.strip()
             e += "Last Message: <%s>\n"%self.lastSent.strip()
             sys.stderr.write(e)
@@ -35,29 +636,192 @@ class Connection:
         The protocol uses CP437 encoding - https://en.wikipedia.org/wiki/Code_page_437
         which is mildly distressing as it can't encode all of Unicode.
         """
+        if self.writeFilter is not None:
+            # filtered and written under one lock, so the filter sees the writes in the
+            # order they reach the server
+            with self._writeLock:
+                commands = self.writeFilter.filter(f, data, self.worldCache)
+                if commands is None:
+                    self._sendCommand(f, data)
+                else:
+                    self._sendCommands([(f, args) for args in commands])
+            return
+        self._sendCommand(f, data)
+
+    def _sendCommand(self, f, data):
+        if self.rateController is not None:
+            self.rateController.acquire(f)
+        s = self._encode(f, data)
+        if self.metrics is not None:
+            self.metrics.recordSend(f, len(s))
+        with self._writeLock:
+            # invalidated under the write lock, so reads written before carry an older token
+            if self.worldCache is not None:
+                self.worldCache.sent(f, data)
+            self._record(s, None)
+            self._write(s, False)
+
+    def sendMany(self, f, argsList):
+        """
+        Sends command f once per argument tuple of argsList, all in a single write. 
+        Like :func:`send`, no replies are expected.
+        """
+        self.sendCommands([(f, data) for data in argsList])
+
+    def sendCommands(self, commands):
+        """
+        Sends several commands, [(f, argument tuple), ...], in order and in a single 
+        write.  Like :func:`send`, no replies are expected.
+        """
+        if self.writeFilter is not None:
+            with self._writeLock:
+                self._sendCommands(self.writeFilter.filterCommands(commands, self.worldCache))
+            return
+        self._sendCommands(commands)
 
-        s = b"".join([f, b"(", flatten_parameters_to_bytestring(data), b")", b"\n"])
-        # print(s)
-        self._send(s)
+    def _sendCommands(self, commands):
+        if not commands:
+            return
+        lines = []
+        for f, data in commands:
+            if self.rateController is not None:
+                self.rateController.acquire(f)
+            s = self._encode(f, data)
+            if self.metrics is not None:
+                self.metrics.recordSend(f, len(s))
+            lines.append(s)
+        with self._writeLock:
+            if self.worldCache is not None:
+                for f, data in commands:
+                    self.worldCache.sent(f, data)
+            for s in lines:
+                self._record(s, None)
+            self._write(b"".join(lines), False)
+
+    @staticmethod
+    def _encode(f, data):
+        prefix = Connection._prefixes.get(f)
+        if prefix is None:
+            prefix = Connection._prefixes[f] = f + b"("
+        return b"".join((prefix, flatten_parameters_to_bytestring(data), b")\n"))
 
     def _send(self, s):
         """
         The actual socket interaction from self.send, extracted for easier mocking
         and testing
         """
-        self.drain()
         self.lastSent = s
 
-        self.socket.sendall(s)
+        sock = self.socket
+        try:
+            sock.sendall(s)
+        except OSError:
+            # the outbox already holds s and is replayed by a successful reconnect
+            if not self._reconnect(sock):
+                raise
 
-    def receive(self):
-        """Receives data. Note that the trailing newline '\n' is trimmed"""
-        s = self.socket.makefile("r").readline().rstrip("\n")
-        if s == Connection.RequestFailed:
-            raise RequestError("%s failed"%self.lastSent.strip())
-        return s
+    def receive(self, timeout = None):
+        """
+        Receives data. Note that the trailing newline '\n' is trimmed
+
+        Returns the oldest unexpected reply if there is one, otherwise the first
+        reply after those of the outstanding pipelined requests.
+
+        :raises RequestTimeout: if nothing arrives within timeout seconds (default self.timeout)
+        """
+        pending = PendingResponse(self, self.lastSent)
+        # answers the last command sent
+        pending.sequence = self._sequence
+        # checked and registered under one lock, so a reply arriving in between is not 
+        # filed as unexpected while pending waits for the next one
+        with self._readLock:
+            if self.unexpected:
+                s = self.unexpected.popleft()
+            elif self.closed:
+                s = None
+                error = ConnectionError("connection closed")
+            else:
+                s = None
+                error = None
+                self._pending.append(pending)
+        if s is not None:
+            pending._set(s)
+        elif error is not None:
+            pending._fail(error)
+        return pending.result(timeout)
+
+    def sendReceive(self, *data, timeout = None):
+        """
+        Sends and receive data
+
+        :raises RequestTimeout: if the reply does not arrive within timeout seconds (default self.timeout)
+        """
+        return self.sendPipelined(*data).result(timeout)
+
+    def sendRead(self, *data, timeout = None):
+        """
+        Like :func:`sendReceive`, for world reads whose replies go into self.worldCache
+
+        :return: (reply, the world cache token of the request)
+        :rtype: tuple
+        """
+        pending = self.sendPipelined(*data)
+        return pending.result(timeout), pending.token
+
+    def sendPipelined(self, f, *data):
+        """
+        Sends a request without waiting for its reply
+
+        :return: a slot that is filled in with the reply once it has been read
+        :rtype: PendingResponse
+        """
+        if self.rateController is not None:
+            self.rateController.acquire(f)
+        s = self._encode(f, data)
+        pending = PendingResponse(self, s, f)
+        if self.metrics is not None:
+            self.metrics.recordSend(f, len(s))
+            pending.sentAt = time.perf_counter()
+        # queue order must match wire order, so register and write under the same lock
+        with self._writeLock:
+            if self.worldCache is not None:
+                pending.token = self.worldCache.token()
+            self._expect(pending)
+            self._record(s, pending)
+            self._write(s, True)
+        return pending
+
+    def collect(self):
+        """
+        Waits for the replies of all outstanding pipelined requests
+
+        :return: the resolved requests in the order they were sent
+        :rtype: list
+        """
+        with self._readLock:
+            resolved = list(self._pending)
+        for pending in resolved:
+            pending.wait()
+        return resolved
+
+class TimeoutConnection:
+    """
+    Connection proxy whose requests time out after timeout seconds, used by the 
+    withTimeout methods of :class:`mcpython.minecraft.Minecraft` and 
+    :class:`mcpython.minecraft.CmdEntity`.  Everything else goes to the connection.
+    """
+    def __init__(self, conn, timeout):
+        self.conn = conn
+        self.timeout = timeout
+
+    def sendReceive(self, *data, timeout = None):
+        return self.conn.sendReceive(*data, timeout = self.timeout if timeout is None else timeout)
+
+    def sendRead(self, *data, timeout = None):
+        return self.conn.sendRead(*data, timeout = self.timeout if timeout is None else timeout)
+
+    def receive(self, timeout = None):
+        return self.conn.receive(self.timeout if timeout is None else timeout)
 
-    def sendReceive(self, *data):
-        """Sends and receive data"""
-        self.send(*data)
-        return self.receive()
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
@@ -0,0 +1,255 @@
+import math
+import threading
+from .cache import WorldCache, baseConnections
+from .util import flatten
+
+""" Dropping writes that would not change the world
+
+    Turned on with Minecraft.filterWrites().  The filter remembers the material of
+    every block written with world.setBlock and world.setBlocks, and also knows the
+    block states the world cache (Minecraft.cacheWorld) has read with
+    getBlockWithData.  A setBlock of the material a block already has, with no state
+    properties, is not sent; a setBlocks over blocks that partly hold it already is
+    cut down to a few cuboids covering only the blocks that change, or dropped when
+    none do.  A material read with getBlock alone is not enough: stairs read back as
+    OAK_STAIRS are still changed by a setBlock of OAK_STAIRS, which resets their
+    state.  Other world.set* commands (stairs, doors, ...) are always sent and make
+    the filter and the world cache forget the blocks around them, restoring a
+    checkpoint makes the filter forget everything.
+
+    The filter only knows about writes sent through this connection.  Blocks changed
+    by players or the game are written again once the remembered state is older
+    than ttl seconds, or right away for blocks reported by CmdEvents.pollBlockHits.
+
+        writes = mc.filterWrites()
+        for frame in animation:
+            draw(mc, frame)
+        print(writes.stats())
+"""
+
+def _material(m):
+    """Name a material argument is compared by, or None when it cannot be compared"""
+    if not isinstance(m, str):
+        return None
+    m = m.upper()
+    if m.startswith("MINECRAFT:"):
+        m = m[10:]
+    return m
+
+def _stateless(state):
+    """Material of a cached getBlockWithData reply with no state properties, otherwise None"""
+    if state is None or "[" in state:
+        return None
+    return _material(state)
+
+def _boxes(changed, ny, nx, nz, limit):
+    """
+    Covers the set cells of changed, a (ny, nx, nz) mask in y, x, z order, with cuboids
+
+    :return: [(iy0, ix0, iz0, iy1, ix1, iz1)], or None when more than limit are needed
+    """
+    todo = bytearray(changed)
+    boxes = []
+    for iy in range(ny):
+        for ix in range(nx):
+            row = (iy * nx + ix) * nz
+            iz = todo.find(1, row, row + nz)
+            while iz != -1:
+                iz -= row
+                z1 = iz
+                while z1 + 1 < nz and todo[row + z1 + 1]:
+                    z1 += 1
+                x1 = ix
+                while x1 + 1 < nx and 0 not in todo[(iy * nx + x1 + 1) * nz + iz:(iy * nx + x1 + 1) * nz + z1 + 1]:
+                    x1 += 1
+                y1 = iy
+                while y1 + 1 < ny and all(0 not in todo[((y1 + 1) * nx + x) * nz + iz:((y1 + 1) * nx + x) * nz + z1 + 1]
+                                          for x in range(ix, x1 + 1)):
+                    y1 += 1
+                if len(boxes) == limit:
+                    return None
+                boxes.append((iy, ix, iz, y1, x1, z1))
+                clear = bytes(z1 - iz + 1)
+                for y in range(iy, y1 + 1):
+                    for x in range(ix, x1 + 1):
+                        start = (y * nx + x) * nz + iz
+                        todo[start:start + z1 - iz + 1] = clear
+                iz = todo.find(1, row, row + nz)
+    return boxes
+
+class WriteFilter:
+    """
+    Drops world.setBlock and world.setBlocks commands that would not change anything
+
+    :param ttl: seconds a written block is trusted to still hold what was written, None
+        trusts it until something else is written there -- (default 10.0)
+    :type ttl: float
+    :param maxChunks: chunks of written blocks remembered -- (default 4096)
+    :type maxChunks: int
+    :param maxVolume: larger setBlocks are sent as they are, without comparing, and make
+        the filter forget the blocks they write -- (default 32768)
+    :type maxVolume: int
+    :param maxPieces: a setBlocks that would leave at least half of its blocks as they
+        are is split into at most this many setBlocks, otherwise it is sent as it is -- (default 8)
+    :type maxPieces: int
+    """
+    Margin = 1
+
+    def __init__(self, ttl = 10.0, maxChunks = 4096, maxVolume = 32768, maxPieces = 8):
+        self.known = WorldCache(ttl, maxChunks)
+        self.maxVolume = maxVolume
+        self.maxPieces = maxPieces
+        self.suppressed = 0
+        self.trimmed = 0
+        self.blocksSkipped = 0
+        self.passed = 0
+        self._lock = threading.Lock()
+
+    def attach(self, conn):
+        """Filters the writes sent through conn (a Connection, ConnectionPool or proxy of one)"""
+        for c in baseConnections(conn):
+            c.writeFilter = self
+
+    def detach(self, conn):
+        for c in baseConnections(conn):
+            if c.writeFilter is self:
+                c.writeFilter = None
+
+    def filter(self, f, data, readCache = None):
+        """
+        Called by the connection before it sends command f with data
+
+        :param readCache: cache of blocks read from the server, consulted for blocks
+            this filter has not written, and told to forget the blocks around other
+            world.set* commands
+        :type readCache: mcpython.cache.WorldCache
+
+        :return: None to send the command as it is, otherwise the argument tuples of
+            the f commands to send instead (an empty list drops it)
+        """
+        if f == b"world.setBlock":
+            n = 3
+        elif f == b"world.setBlocks":
+            n = 6
+        elif f.startswith(b"world.set") and f != b"world.setting":
+            n = 0
+        else:
+            if f == b"world.checkpoint.restore":
+                self.clear()
+            return None
+        values = data[0] if len(data) == 1 and type(data[0]) in (tuple, list) else data
+        k = n or 3
+        if len(values) < k or any(type(v) is not int for v in values[:k]):
+            values = self._values(data)
+        with self._lock:
+            if n == 0 or len(values) != n + 1 or _material(values[n]) is None:
+                # a command this filter cannot follow, whatever it wrote is unknown now
+                self._forget(values, readCache)
+                self.passed += 1
+                return None
+            if n == 3:
+                return self._setBlock(values, readCache)
+            return self._setBlocks(values, readCache)
+
+    def filterCommands(self, commands, readCache = None):
+        """Filters [(f, data), ...] like :func:`filter` => the commands to send instead"""
+        out = []
+        for f, data in commands:
+            replaced = self.filter(f, data, readCache)
+            if replaced is None:
+                out.append((f, data))
+            else:
+                out.extend((f, args) for args in replaced)
+        return out
+
+    @staticmethod
+    def _values(data):
+        values = []
+        for v in flatten(data):
+            if type(v) is float:
+                v = math.floor(v)
+            values.append(v)
+        return values
+
+    def _forget(self, values, readCache):
+        if len(values) >= 3 and all(type(v) is int for v in values[:3]):
+            m = WriteFilter.Margin
+            x, y, z = values[:3]
+            self.known.invalidate(x - m, y - m, z - m, x + m, y + m, z + m)
+            if readCache is not None:
+                readCache.invalidate(x - m, y - m, z - m, x + m, y + m, z + m)
+        else:
+            self.known.clear()
+            if readCache is not None:
+                readCache.clear()
+
+    def _setBlock(self, values, readCache):
+        x, y, z, material = values
+        material = _material(material)
+        known = self.known.block(x, y, z)
+        if known is None and readCache is not None:
+            known = _stateless(readCache.state(x, y, z))
+        if known == material:
+            self.suppressed += 1
+            return []
+        self.known.putBlock(x, y, z, material, self.known.token())
+        self.passed += 1
+        return None
+
+    def _setBlocks(self, values, readCache):
+        x0, y0, z0, x1, y1, z1, raw = values
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        z0, z1 = min(z0, z1), max(z0, z1)
+        material = _material(raw)
+        nx, ny, nz = x1 - x0 + 1, y1 - y0 + 1, z1 - z0 + 1
+        volume = nx * ny * nz
+        if volume > self.maxVolume:
+            # too large to remember block by block, forget the few blocks known there
+            self.known.invalidate(x0, y0, z0, x1, y1, z1)
+            self.passed += 1
+            return None
+        known = self.known.blocks(x0, y0, z0, x1, y1, z1)
+        if readCache is not None and None in known:
+            read = readCache.states(x0, y0, z0, x1, y1, z1)
+            known = [_stateless(r) if k is None else k for k, r in zip(known, read)]
+        changed = bytes(k != material for k in known)
+        unchanged = changed.count(0)
+        if unchanged == volume:
+            self.suppressed += 1
+            return []
+        self.known.putCuboid(x0, y0, z0, x1, y1, z1, material, self.known.token())
+        # several commands only pay off when they leave out a good part of the cuboid
+        boxes = _boxes(changed, ny, nx, nz, self.maxPieces) if unchanged * 2 >= volume else None
+        if boxes is None:
+            self.passed += 1
+            return None
+        self.trimmed += 1
+        self.blocksSkipped += unchanged
+        return [(x0 + ix0, y0 + iy0, z0 + iz0, x0 + ix1, y0 + iy1, z0 + iz1, raw)
+                for iy0, ix0, iz0, iy1, ix1, iz1 in boxes]
+
+    def forget(self, positions):
+        """Forgets what was written at positions [(x,y,z), ...]"""
+        self.known.invalidateBlocks(positions)
+
+    def clear(self):
+        """Forgets every write"""
+        self.known.clear()
+
+    def stats(self):
+        """
+        :return: {"suppressed": commands not sent, "trimmed": setBlocks cut down to the
+            blocks that change, "blocksSkipped": blocks those left out, "passed": commands
+            sent as they were}
+        :rtype: dict
+        """
+        return {
+            "suppressed": self.suppressed,
+            "trimmed": self.trimmed,
+            "blocksSkipped": self.blocksSkipped,
+            "passed": self.passed,
+        }
+
+    def __repr__(self):
+        return "WriteFilter(suppressed=%d, trimmed=%d, passed=%d)"%(self.suppressed, self.trimmed, self.passed)
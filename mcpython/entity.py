@@ -1,3 +1,6 @@
+import collections
+import sys
+
 class Entity:
     '''Minecraft PI entity description. Can be sent to Minecraft.spawnEntity'''
 
@@ -21,6 +24,71 @@ class Entity:
     def __repr__(self):
         return 'Entity(%d)'%(self.id)
 
+class EntityRecord(collections.namedtuple("EntityRecord", "id type x y z")):
+    """One entity returned by getEntities. Indexes like the old [id, type, x, y, z] lists"""
+    __slots__ = ()
+
+    @staticmethod
+    def parse(s):
+        """Parses a getEntities reply ("id,type,x,y,z|...") => [EntityRecord]"""
+        records = []
+        intern = sys.intern
+        for e in s.split("|"):
+            if e:
+                id, type, x, y, z = e.split(",")
+                records.append(EntityRecord(int(id), intern(type), float(x), float(y), float(z)))
+        return records
+
+class EntityColumns:
+    """
+    Columnar getEntities result: numpy arrays ids (int64), x, y, z (float64) and
+    types (uint16 codes into the list typeNames). Needs numpy.
+    """
+    __slots__ = ("ids", "types", "typeNames", "x", "y", "z")
+
+    def __init__(self, ids, types, typeNames, x, y, z):
+        self.ids = ids
+        self.types = types
+        self.typeNames = typeNames
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __repr__(self):
+        return "EntityColumns(%d entities)"%len(self.ids)
+
+    def records(self):
+        """=> [EntityRecord] in the same order"""
+        names = self.typeNames
+        return [EntityRecord(int(i), names[t], float(x), float(y), float(z))
+                for i, t, x, y, z in zip(self.ids, self.types, self.x, self.y, self.z)]
+
+    @staticmethod
+    def parse(s):
+        """Parses a getEntities reply ("id,type,x,y,z|...") => EntityColumns"""
+        from .util import require_numpy
+        numpy = require_numpy("EntityColumns")
+        entries = [e for e in s.split("|") if e]
+        # checked entry by entry, a short entry next to a long one must not shift the columns
+        if any(e.count(",") != 4 for e in entries):
+            raise ValueError("malformed entity list")
+        fields = ",".join(entries).split(",") if entries else []
+        typeCodes = {}
+        types = fields[1::5]
+        for name in dict.fromkeys(types):
+            typeCodes[name] = len(typeCodes)
+        n = len(types)
+        return EntityColumns(
+            numpy.fromiter(map(int, fields[0::5]), dtype = numpy.int64, count = n),
+            numpy.fromiter(map(typeCodes.__getitem__, types), dtype = numpy.uint16, count = n),
+            list(typeCodes),
+            numpy.fromiter(map(float, fields[2::5]), dtype = numpy.float64, count = n),
+            numpy.fromiter(map(float, fields[3::5]), dtype = numpy.float64, count = n),
+            numpy.fromiter(map(float, fields[4::5]), dtype = numpy.float64, count = n))
+
 EXPERIENCE_ORB = Entity(2, "EXPERIENCE_ORB")
 AREA_EFFECT_CLOUD = Entity(3, "AREA_EFFECT_CLOUD")
 ELDER_GUARDIAN = Entity(4, "ELDER_GUARDIAN")
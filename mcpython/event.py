@@ -1,14 +1,33 @@
+import warnings
 from .vec3 import Vec3
+from .util import require_numpy
+
+def _reportMalformed(kind, entries):
+    """Malformed entries are skipped, never turned into a different return type"""
+    warnings.warn("skipped %d malformed %s event(s): %s"%(len(entries), kind, "|".join(entries[:5])),
+                  RuntimeWarning, stacklevel = 3)
 
 class BlockEvent:
     """An Event related to blocks (e.g. placed, removed, hit)"""
     HIT = 0
+    __slots__ = ("type", "x", "y", "z", "face", "entityId", "_pos")
+    Dtype = [("x", "i4"), ("y", "i4"), ("z", "i4"), ("face", "i4"), ("entityId", "i8")]
 
     def __init__(self, type, x, y, z, face, entityId):
         self.type = type
-        self.pos = Vec3(x, y, z)
+        self.x = x
+        self.y = y
+        self.z = z
         self.face = face
         self.entityId = entityId
+        self._pos = None
+
+    @property
+    def pos(self):
+        """Position as a Vec3, created on first use"""
+        if self._pos is None:
+            self._pos = Vec3(self.x, self.y, self.z)
+        return self._pos
 
     def __repr__(self):
         sType = {
@@ -22,9 +41,48 @@ class BlockEvent:
     def Hit(x, y, z, face, entityId):
         return BlockEvent(BlockEvent.HIT, x, y, z, face, entityId)
 
+    @staticmethod
+    def parseHits(s):
+        """Parses an events.block.hits reply ("x,y,z,face,entityId|...") => [BlockEvent]"""
+        events = []
+        malformed = []
+        for e in s.split("|"):
+            if not e:
+                continue
+            try:
+                x, y, z, face, entityId = e.split(",")
+                events.append(BlockEvent(BlockEvent.HIT, int(x), int(y), int(z), int(face), int(entityId)))
+            except ValueError:
+                malformed.append(e)
+        if malformed:
+            _reportMalformed("block hit", malformed)
+        return events
+
+    @staticmethod
+    def hitsArray(s):
+        """Parses an events.block.hits reply => numpy record array with fields
+        x, y, z, face and entityId. Needs numpy"""
+        numpy = require_numpy("BlockEvent.hitsArray")
+        entries = [e for e in s.split("|") if e]
+        if all(e.count(",") == 4 for e in entries):
+            fields = ",".join(entries).split(",") if entries else []
+            # all numbers in one go, only a bad number sends us down the slow path
+            try:
+                values = numpy.fromiter(map(int, fields), numpy.int64, len(fields)).reshape(-1, 5)
+            except ValueError:
+                values = None
+            if values is not None:
+                hits = numpy.empty(len(entries), dtype = BlockEvent.Dtype)
+                for i, name in enumerate(hits.dtype.names):
+                    hits[name] = values[:, i]
+                return hits.view(numpy.recarray)
+        return numpy.rec.array(numpy.array([(e.x, e.y, e.z, e.face, e.entityId) for e in BlockEvent.parseHits(s)],
+                                           dtype = BlockEvent.Dtype))
+
 class ChatEvent:
     """An Event related to chat (e.g. posts)"""
     POST = 0
+    __slots__ = ("type", "entityId", "message")
 
     def __init__(self, type, entityId, message):
         self.type = type
@@ -42,17 +100,46 @@ class ChatEvent:
     @staticmethod
     def Post(entityId, message):
         return ChatEvent(ChatEvent.POST, entityId, message)
-    
+
+    @staticmethod
+    def parsePosts(s):
+        """Parses an events.chat.posts reply ("entityId,message|...") => [ChatEvent]"""
+        events = []
+        malformed = []
+        for e in s.split("|"):
+            if not e:
+                continue
+            entityId, comma, message = e.partition(",")
+            try:
+                events.append(ChatEvent(ChatEvent.POST, int(entityId), message))
+            except ValueError:
+                malformed.append(e)
+        if malformed:
+            _reportMalformed("chat post", malformed)
+        return events
+
 class ProjectileEvent:
     """An Event related to projectiles (e.g. placed, removed, hit)"""
     HIT = 0
+    __slots__ = ("type", "x", "y", "z", "originName", "targetId", "targetType", "_pos")
+    Dtype = [("x", "i4"), ("y", "i4"), ("z", "i4"), ("originName", "O"), ("targetId", "i8"), ("targetType", "O")]
 
     def __init__(self, type, x, y, z, originName,targetId, targetType,):
         self.type = type
-        self.pos = Vec3(x, y, z)
+        self.x = x
+        self.y = y
+        self.z = z
         self.originName = originName
         self.targetId = targetId
         self.targetType = targetType
+        self._pos = None
+
+    @property
+    def pos(self):
+        """Position as a Vec3, created on first use"""
+        if self._pos is None:
+            self._pos = Vec3(self.x, self.y, self.z)
+        return self._pos
 
     def __repr__(self):
         sType = {
@@ -65,3 +152,31 @@ class ProjectileEvent:
     @staticmethod
     def Hit(x, y, z, originName,targetId, targetType):
         return ProjectileEvent(BlockEvent.HIT, x, y, z, originName, targetId, targetType)
+
+    @staticmethod
+    def _fields(s):
+        """Yields (x, y, z, originName, targetId, targetType) per well formed entry"""
+        malformed = []
+        for e in s.split("|"):
+            if not e:
+                continue
+            try:
+                x, y, z, originName, targetId, targetType = e.split(",")
+                yield int(x), int(y), int(z), originName, int(targetId), targetType
+            except ValueError:
+                malformed.append(e)
+        if malformed:
+            _reportMalformed("projectile hit", malformed)
+
+    @staticmethod
+    def parseHits(s):
+        """Parses an events.projectile.hits reply ("x,y,z,originName,targetId,targetType|...")
+        => [ProjectileEvent]. targetId is 0 when no entity was hit"""
+        return [ProjectileEvent(ProjectileEvent.HIT, *fields) for fields in ProjectileEvent._fields(s)]
+
+    @staticmethod
+    def hitsArray(s):
+        """Parses an events.projectile.hits reply => numpy record array with fields x, y, z,
+        originName, targetId and targetType. Needs numpy"""
+        numpy = require_numpy("ProjectileEvent.hitsArray")
+        return numpy.rec.array(numpy.array(list(ProjectileEvent._fields(s)), dtype = ProjectileEvent.Dtype))
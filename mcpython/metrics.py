@@ -0,0 +1,162 @@
+import bisect
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+""" Per-command metrics for a Connection
+
+    Turned on with Connection.enableMetrics().  Commands are keyed by their name
+    (world.getBlock, entity.getAge, ...).  For every command the connection counts
+    calls, bytes sent and received and failed requests (RequestError), and for
+    requests that get a reply it keeps a latency histogram.  Recording costs one
+    dict lookup and a few additions under a lock, so it can stay on in production.
+
+        metrics = mc.conn.enableMetrics()
+        ...
+        print(metrics.snapshot()["world.getBlock"]["count"])
+        metrics.serve(9464)    # Prometheus text format on http://127.0.0.1:9464/metrics
+"""
+
+class CommandStats:
+    """Counters for one command"""
+    __slots__ = ("count", "failures", "bytesSent", "bytesReceived", "replies", "latencySum", "buckets")
+
+    def __init__(self, nbuckets):
+        self.count = 0
+        self.failures = 0
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.replies = 0
+        self.latencySum = 0.0
+        self.buckets = [0] * (nbuckets + 1)
+
+class Metrics:
+    """
+    Metrics store shared by the sending threads and the reader thread of a Connection
+
+    :param buckets: upper bounds of the latency histogram buckets in seconds
+    :type buckets: tuple
+    """
+    Buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets = None):
+        self.buckets = tuple(buckets or Metrics.Buckets)
+        self._commands = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, key):
+        stats = self._commands.get(key)
+        if stats is None:
+            stats = self._commands[key] = CommandStats(len(self.buckets))
+        return stats
+
+    def recordSend(self, key, nbytes):
+        """Counts a command of nbytes sent for key (the command name as bytes)"""
+        with self._lock:
+            stats = self._stats(key)
+            stats.count += 1
+            stats.bytesSent += nbytes
+
+    def recordReply(self, key, nbytes, latency, failed):
+        """Counts a reply of nbytes that arrived latency seconds after its request was sent"""
+        with self._lock:
+            stats = self._stats(key)
+            stats.replies += 1
+            stats.bytesReceived += nbytes
+            stats.latencySum += latency
+            stats.buckets[bisect.bisect_left(self.buckets, latency)] += 1
+            if failed:
+                stats.failures += 1
+
+    def reset(self):
+        with self._lock:
+            self._commands = {}
+
+    def snapshot(self):
+        """
+        :return: {command: {"count", "failures", "bytesSent", "bytesReceived", "replies",
+            "latencySum", "latencyBuckets": [(upper bound, cumulative count)]}}
+        :rtype: dict
+        """
+        with self._lock:
+            items = [(key, stats, list(stats.buckets)) for key, stats in self._commands.items()]
+            result = {}
+            for key, stats, buckets in items:
+                cumulative = []
+                total = 0
+                for bound, n in zip(self.buckets + (float("inf"),), buckets):
+                    total += n
+                    cumulative.append((bound, total))
+                result[key.decode("UTF-8", "replace")] = {
+                    "count": stats.count,
+                    "failures": stats.failures,
+                    "bytesSent": stats.bytesSent,
+                    "bytesReceived": stats.bytesReceived,
+                    "replies": stats.replies,
+                    "latencySum": stats.latencySum,
+                    "latencyBuckets": cumulative}
+        return result
+
+    def toPrometheus(self, prefix = "mcpython"):
+        """
+        :return: all metrics in the Prometheus text exposition format
+        :rtype: str
+        """
+        snapshot = sorted(self.snapshot().items())
+        lines = []
+
+        def counter(name, field, help):
+            lines.append("# HELP %s_%s %s"%(prefix, name, help))
+            lines.append("# TYPE %s_%s counter"%(prefix, name))
+            for command, stats in snapshot:
+                lines.append('%s_%s{command="%s"} %s'%(prefix, name, command, stats[field]))
+
+        counter("commands_total", "count", "Commands sent.")
+        counter("request_failures_total", "failures", "Requests the server answered with Fail.")
+        counter("sent_bytes_total", "bytesSent", "Bytes sent.")
+        counter("received_bytes_total", "bytesReceived", "Reply bytes received.")
+        name = "%s_request_latency_seconds"%prefix
+        lines.append("# HELP %s Time from sending a request to reading its reply."%name)
+        lines.append("# TYPE %s histogram"%name)
+        for command, stats in snapshot:
+            if not stats["replies"]:
+                continue
+            for bound, n in stats["latencyBuckets"]:
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append('%s_bucket{command="%s",le="%s"} %d'%(name, command, le, n))
+            lines.append('%s_sum{command="%s"} %r'%(name, command, stats["latencySum"]))
+            lines.append('%s_count{command="%s"} %d'%(name, command, stats["replies"]))
+        return "\n".join(lines) + "\n"
+
+    def writePrometheus(self, path):
+        """Writes :func:`toPrometheus` to a file, e.g. for the node exporter's textfile collector"""
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(self.toPrometheus())
+        os.replace(tmp, path)
+
+    def serve(self, port = 9464, address = "127.0.0.1"):
+        """
+        Serves :func:`toPrometheus` over HTTP from a background thread
+
+        :return: the running server, stop it with server.shutdown()
+        :rtype: http.server.ThreadingHTTPServer
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.toPrometheus().encode("UTF-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((address, port), Handler)
+        thread = threading.Thread(target = server.serve_forever, name = "mcpython-metrics", daemon = True)
+        thread.start()
+        return server
@@ -1,10 +1,16 @@
-from .connection import Connection
+from .connection import Connection, RequestError, TimeoutConnection
 from .vec3 import Vec3
 from .event import BlockEvent, ChatEvent, ProjectileEvent
-from .entity import Entity
-from .block import Block
+from .entity import Entity, EntityRecord, EntityColumns
+from .block import Block, BlockState
 import math
-from .util import flatten
+from .util import flatten, escape_text, escape_line, chat_lines, unpack_block_palette, blocks_array, require_numpy
+import collections
+from .pipeline import Pipeline, bind
+from .pool import ConnectionPool, pipelineMap
+from .cache import WorldCache
+from .dedup import WriteFilter
+from .session import EditSession
 from enum import Enum
 
 """ Minecraft for serveur v1.15.1 and later
@@ -54,6 +60,11 @@ class Dir():
 def intFloor(*args):
     return [int(math.floor(x)) for x in flatten(args)]
 
+def supports(conn, capability):
+    """Whether the server behind conn announced an optional protocol feature"""
+    capabilities = getattr(conn, "capabilities", None)
+    return capabilities is not None and capability in capabilities()
+
 class CmdPositioner:
     """
     Methods for setting and getting positions (currently used for entities and players)
@@ -87,6 +98,45 @@ class CmdPositioner:
     def id(self, val):
         self._id = val
 
+    def pipeline(self):
+        """
+        Returns a proxy whose method calls are sent without waiting for replies
+
+        :return: pipeline proxy; its calls return :class:`mcpython.pipeline.PendingCall` slots
+        :rtype: mcpython.pipeline.Pipeline
+        """
+        return Pipeline(self)
+
+    def map(self, method, argsList):
+        """
+        Calls a method once per entry of argsList without waiting between calls.  When 
+        the connection is a :class:`mcpython.pool.ConnectionPool` the calls are spread 
+        over all of its sockets.
+
+        :param method: method name or bound method, e.g. "getAge" or entity.getAge
+        :type method: str, method
+        :param argsList: argument tuples, e.g. [(id1,), (id2,)], or single arguments
+        :type argsList: list
+
+        :return: the results in the order of argsList
+        :rtype: list
+        """
+        if isinstance(self.conn, ConnectionPool):
+            return self.conn.map(self, method, argsList)
+        return pipelineMap(self, method, argsList)
+
+    def withTimeout(self, timeout):
+        """
+        Returns a copy of this object whose queries give up after timeout seconds
+
+        :param timeout: seconds to wait for each reply
+        :type timeout: float
+
+        :return: a copy that raises :class:`mcpython.connection.RequestTimeout` instead of 
+            waiting longer; the late reply is discarded
+        """
+        return bind(self, TimeoutConnection(self.conn, timeout))
+
     def getType(self, id = None):
         """
         Get entity type (e.g. SKELETON)
@@ -298,7 +348,7 @@ class CmdEntity(CmdPositioner):
                 id = Minecraft.getPlayerEntityIdStatic(self.conn, self.id)
         return self.conn.sendReceive(b"entity.getName", id)
 
-    def getEntities(self, id = None, distance=10, typeId=""):
+    def getEntities(self, id = None, distance=10, typeId="", columns = False):
         """
         :param id: entity or player id, can be integer or gamertag -- (default None). If id is None then uses self.id.
         :type id: str, int 
@@ -306,8 +356,11 @@ class CmdEntity(CmdPositioner):
         :type distance: int 
         :param typeId: entity type id (e.g. "SKELETON") -- (default "").
         :type typeId: str 
+        :param columns: return numpy columns instead of records (needs numpy) -- (default False).
+        :type columns: bool 
 
-        :return: list of entities [[entityId:int, entityTypeId:str, posX:float, posY:float, posZ:float]]
+        :return: list of entities [EntityRecord(id:int, type:str, x:float, y:float, z:float)], 
+            or :class:`mcpython.entity.EntityColumns` 
         :rtype: list        
         """
         if id is None:
@@ -317,11 +370,10 @@ class CmdEntity(CmdPositioner):
             else:
                 id = self.id
         s = self.conn.sendReceive(self.pkg + b".getEntities", id, distance, typeId)
-        entities = [e for e in s.split("|") if e]
         
         try:
-            return [ [int(n.split(",")[0]), n.split(",")[1], float(n.split(",")[2]), float(n.split(",")[3]), float(n.split(",")[4])] for n in entities]
-        except:
+            return EntityColumns.parse(s) if columns else EntityRecord.parse(s)
+        except ValueError:
             return s
 
     def removeEntities(self, id = None, distance=10, typeId=""):
@@ -763,7 +815,7 @@ class CmdEntity(CmdPositioner):
     
     # -------------------------------------- EVENTS --------------------------------------
 
-    def pollBlockHits(self, id = None):
+    def pollBlockHits(self, id = None, array = False):
         """
         Wrapper for :func:`mcpython.minecraft.CmdEvents.pollBlockHits`
         supplies correct pkg and id variables. Currently only used by :class:`~mcpython.minecraft.CmdPlayer`
@@ -775,7 +827,7 @@ class CmdEntity(CmdPositioner):
                 return("no id specified")
             else:
                 id = self.id
-        return CmdEvents.pollBlockHits(self.conn, self.pkg, id)
+        return CmdEvents.pollBlockHits(self.conn, self.pkg, id, array = array)
  
     def pollChatPosts(self, id = None):
         """
@@ -791,7 +843,7 @@ class CmdEntity(CmdPositioner):
                 id = self.id
         return CmdEvents.pollChatPosts(self.conn, self.pkg, id)
    
-    def pollProjectileHits(self, id = None):
+    def pollProjectileHits(self, id = None, array = False):
         """
         Wrapper for :func:`mcpython.minecraft.CmdEvents.pollProjectileHits`
         supplies correct pkg variable. Currently only used by :class:`~mcpython.minecraft.CmdPlayer`
@@ -803,7 +855,7 @@ class CmdEntity(CmdPositioner):
                 return("no id specified")
             else:
                 id = self.id
-        return CmdEvents.pollProjectileHits(self.conn, self.pkg, id)
+        return CmdEvents.pollProjectileHits(self.conn, self.pkg, id, array = array)
         
     def clearEvents(self, id = None):
         """
@@ -843,7 +895,10 @@ class CmdPlayer(CmdEntity):
     """
     def __init__(self, connection, id = None):
         CmdPositioner.__init__(self, connection, b"player")
+        self.name = None
         self.id = id
+        if hasattr(connection, "addReconnectHook"):
+            connection.addReconnectHook(self._restoreSession)
         
     @property
     def id(self):
@@ -856,14 +911,29 @@ class CmdPlayer(CmdEntity):
     def id(self, val):
         if isinstance(val, int):
             self._id = val
+            self.name = None
             self.pkg = b"multiplayer"
         elif isinstance(val, str) and val != "":
             self._id = Minecraft.getPlayerEntityIdStatic(self.conn, val)
+            self.name = val
             self.pkg = b"multiplayer"
         else:
             self._id = []
+            self.name = None
             self.pkg = b"player"
 
+    def _restoreSession(self):
+        """
+        Run by the connection after it reconnected: a player that was given by 
+        gamertag gets its entity id looked up again, since a restarted server hands 
+        out new ids.
+        """
+        if self.name:
+            try:
+                self.id = self.name
+            except (RequestError, ValueError):
+                pass
+
 # The following code might be outdeated or might have been wishful thinking.  As of 
 # 8/2021 I (Lis) can find know Bukkit hooks for controlling the player camera.
 
@@ -914,7 +984,7 @@ class CmdEvents:
         conn.send(b"events.clear")
 
     @staticmethod
-    def pollBlockHits(conn, pkg = None, *args):
+    def pollBlockHits(conn, pkg = None, *args, array = False):
         """
         Returns block hits by sword.
         
@@ -924,22 +994,34 @@ class CmdEvents:
         :param pkg: message type -- (default None - use default instead of "events")
         :type pkg: str - ("entity", "world", "player", "multiplayer")
         :param \*args: a list of additional args, currently entityid is supported
+        :param array: return a numpy record array (x, y, z, face, entityId) instead -- (default False)
+        :type array: bool
         
         :return: A list of :class:`mcpython.event.BlockEvent` objects [type, pos (Vec3), face, entityId]
         :rtype: list
 
         :Note: Only returns block hits occurring while the current python program has an established connection. 
         :Note: Only triggered by sword => [BlockEvent]
+        :Note: Malformed entries are skipped with a RuntimeWarning.
         """
         if pkg:
             s = conn.sendReceive(pkg + b".events.block.hits", flatten(args))
         else:
             s = conn.sendReceive(b"events.block.hits")
-        events = [e for e in s.split("|") if e]
-        try: 
-            return [BlockEvent.Hit(*list(map(int, e.split(",")))) for e in events]
-        except:
-            return s
+        hits = BlockEvent.hitsArray(s) if array else BlockEvent.parseHits(s)
+        if len(hits):
+            # a hit block may have been broken
+            if array:
+                positions = [(int(x), int(y), int(z)) for x, y, z in zip(hits.x, hits.y, hits.z)]
+            else:
+                positions = [(e.x, e.y, e.z) for e in hits]
+            cache = getattr(conn, "worldCache", None)
+            if cache is not None:
+                cache.invalidateBlocks(positions)
+            writeFilter = getattr(conn, "writeFilter", None)
+            if writeFilter is not None:
+                writeFilter.forget(positions)
+        return hits
 
     @staticmethod
     def pollChatPosts(conn, pkg = None, *args):
@@ -957,20 +1039,16 @@ class CmdEvents:
         :rtype: list
 
         :Note: Only returns chat posts occurring while the current python program has an established connection
+        :Note: Malformed entries are skipped with a RuntimeWarning.
         """
         if pkg:
             s = conn.sendReceive(pkg + b".events.chat.posts", flatten(args))
         else:
             s = conn.sendReceive(b"events.chat.posts")
-
-        events = [e for e in s.split("|") if e]
-        try:
-            return [ChatEvent.Post(int(e[:e.find(",")]), e[e.find(",") + 1:]) for e in events]
-        except:
-            return s
+        return ChatEvent.parsePosts(s)
     
     @staticmethod
-    def pollProjectileHits(conn, pkg = None, *args):
+    def pollProjectileHits(conn, pkg = None, *args, array = False):
         """
         Returns projectile hits posts since last poll.
         
@@ -980,54 +1058,225 @@ class CmdEvents:
         :param pkg: message type -- (default None - use default instead of "events")
         :type pkg: str - ("entity", "world", "player", "multiplayer")
         :param \*args: a list of additional args, currently entityid is supported
+        :param array: return a numpy record array (x, y, z, originName, targetId, targetType) instead -- (default False)
+        :type array: bool
         
         :return: A list of :class:`mcpython.event.ProjectileEvent` objects [type, pos (Vec3), originName, targetId, targetType]
         :rtype: list
 
         :Note: Only returns projectile hits occurring while the current python program has an established connection. 
-        :Note: Only triggered by projectile => [BlockEvent]
+        :Note: Only triggered by projectile => [ProjectileEvent]
+        :Note: Malformed entries are skipped with a RuntimeWarning.
         """
         if pkg:
             s = conn.sendReceive(pkg + b".events.projectile.hits", flatten(args))
         else:
             s = conn.sendReceive(b"events.projectile.hits")
-        events = [e for e in s.split("|") if e]
-        results = []
-        for e in events:
-            info = e.split(",")
-            results.append(ProjectileEvent.Hit(
-                int(info[0]), 
-                int(info[1]), 
-                int(info[2]), 
-                info[3],       # noms du joueur
-                int(info[4]),  # entityId si c'est 0 c'est que aucune entité n'a été touchée
-                info[5]))      # entitTname
-        return results        
+        if array:
+            return ProjectileEvent.hitsArray(s)
+        return ProjectileEvent.parseHits(s)
 
 class Minecraft:
     """version modified  1.1 - jan 2020
     The main class to interact with a running instance of Minecraft  java server v 1.13 and later
     
     """
+    ChatLineLength = 256
+
     def __init__(self, connection):
         self.conn = connection        
+        self.cache = None
+        self.writeFilter = None
+
+    def pipeline(self):
+        """Return a proxy whose method calls are sent without waiting for replies
+        => Pipeline (calls return PendingCall slots, use .result())"""
+        return Pipeline(self)
+
+    def map(self, method, argsList):
+        """Call a method (name or bound method) once per argument tuple of argsList
+        => [results] in the order of argsList. Spread over all sockets of a ConnectionPool"""
+        if isinstance(self.conn, ConnectionPool):
+            return self.conn.map(self, method, argsList)
+        return pipelineMap(self, method, argsList)
+
+    def withTimeout(self, timeout):
+        """Return a copy whose queries raise RequestTimeout after waiting timeout seconds
+        for a reply => Minecraft. The late reply is discarded"""
+        return bind(self, TimeoutConnection(self.conn, timeout))
+        
+    def cacheWorld(self, enabled = True, **options):
+        """Turn the client-side world cache on (or off with enabled=False) => WorldCache or None.
+        getBlock, getBlockWithData and getHeight are then answered from it when possible;
+        writes sent through this connection and polled block hits invalidate it.
+        options are passed to :class:`mcpython.cache.WorldCache` (ttl, maxChunks, prefetch)"""
+        if self.cache is not None:
+            self.cache.detach(self.conn)
+            self.cache = None
+        if enabled:
+            self.cache = WorldCache(**options)
+            self.cache.attach(self.conn)
+        return self.cache
+
+    def filterWrites(self, enabled = True, **options):
+        """Turn dropping of redundant writes on (or off with enabled=False) => WriteFilter or None.
+        setBlock and setBlocks commands sent through this connection are then compared with
+        the blocks written before and the world cache; writes that change nothing are not
+        sent and partly redundant setBlocks are cut down to the blocks that change.
+        options are passed to :class:`mcpython.dedup.WriteFilter` (ttl, maxChunks, maxVolume, maxPieces)"""
+        if self.writeFilter is not None:
+            self.writeFilter.detach(self.conn)
+            self.writeFilter = None
+        if enabled:
+            self.writeFilter = WriteFilter(**options)
+            self.writeFilter.attach(self.conn)
+        return self.writeFilter
+
+    def editSession(self):
+        """Return a proxy that holds back world writes (setBlock, setBlocks, setStairs, ...)
+        until it is committed => EditSession. Used as a context manager it commits at the
+        end of the block: overwritten blocks are dropped, plain writes merged into cuboids
+        and everything is sent in a single write"""
+        return EditSession(self)
 
-        
     # GetBlock n'utilise que des arguments de position mais renvoie une chaîne de caractères
     def getBlock(self, *args):
         """Get block (x,y,z) => return Material type : string -  v 1.15.1 """
-
-        return self.conn.sendReceive(b"world.getBlock", intFloor(args))
+        pos = intFloor(args)
+        cache = self.cache
+        if cache is None:
+            return self.conn.sendReceive(b"world.getBlock", pos)
+        material = cache.block(*pos)
+        if material is None:
+            if cache.prefetch:
+                return self._cacheSection(cache, pos)
+            material, token = self.conn.sendRead(b"world.getBlock", pos)
+            cache.putBlock(pos[0], pos[1], pos[2], material, token)
+        return material
+
+    def _cacheSection(self, cache, pos):
+        """Reads the 16x16x16 section holding pos into the cache => material at pos"""
+        x, y, z = pos
+        x0, y0, z0 = x & ~15, y & ~15, z & ~15
+        section = (x0, y0, z0, x0 + 15, y0 + 15, z0 + 15)
+        if supports(self.conn, Connection.BinaryBlocks):
+            s, token = self.conn.sendRead(b"world.getBlocksBinary", section)
+            palette, indices = unpack_block_palette(s)
+            materials = [palette[i] for i in indices]
+        else:
+            s, token = self.conn.sendRead(b"world.getBlocks", section)
+            materials = s.split(",")
+        cache.putSection(x, y, z, materials, token)
+        return materials[(y - y0) << 8 | (x - x0) << 4 | (z - z0)]
         
     def getBlockWithData(self, *args):
-        """Get block with data (x,y,z) => Block -  v 1.15.1 """
-        return self.conn.sendReceive(b"world.getBlockWithData", intFloor(args))
+        """Get block with data (x,y,z) => state string like "minecraft:oak_stairs[facing=east]" -  v 1.15.1.
+        See getBlockState for the parsed form"""
+        pos = intFloor(args)
+        cache = self.cache
+        if cache is None:
+            return self.conn.sendReceive(b"world.getBlockWithData", pos)
+        state = cache.state(*pos)
+        if state is None:
+            state, token = self.conn.sendRead(b"world.getBlockWithData", pos)
+            cache.putState(pos[0], pos[1], pos[2], state, token)
+        return state
+
+    def getBlockState(self, *args):
+        """Get block with data (x,y,z) parsed => BlockState. Equal state strings give the
+        same shared object, so parsing is paid once per distinct state"""
+        return BlockState.parse(self.getBlockWithData(*args))
+
+    def getBlockStates(self, positions):
+        """Get the block states of many positions [(x,y,z), ...] => [BlockState] in the
+        same order. The requests are pipelined (and spread over a ConnectionPool)"""
+        return self.map("getBlockState", positions)
 
     def getBlocks(self, *args):
-        """Get a cuboid of blocks (x0,y0,z0,x1,y1,z1) - v 1.15.1"""
+        """Get a cuboid of blocks (x0,y0,z0,x1,y1,z1) - v 1.15.1. Uses the compact
+        binary transfer when the server supports it"""
+        if supports(self.conn, Connection.BinaryBlocks):
+            palette, indices = unpack_block_palette(self.conn.sendReceive(b"world.getBlocksBinary", intFloor(args)))
+            return map(palette.__getitem__, indices)
         s = self.conn.sendReceive(b"world.getBlocks", intFloor(args))
         return map(str, s.split(","))
 
+    def getBlocksArray(self, *args):
+        """Get a cuboid of blocks (x0,y0,z0,x1,y1,z1) as a numpy array => (blocks, palette).
+        blocks is a uint16 array indexed [x, y, z] from the lowest corner, holding
+        indices into palette, the list of material names. Needs numpy"""
+        x0, y0, z0, x1, y1, z1 = coords = intFloor(args)
+        shape = (abs(y1 - y0) + 1, abs(x1 - x0) + 1, abs(z1 - z0) + 1)
+        if supports(self.conn, Connection.BinaryBlocks):
+            reply = self.conn.sendReceive(b"world.getBlocksBinary", coords)
+        else:
+            reply = self.conn.sendReceive(b"world.getBlocks", coords)
+        palette = {}
+        blocks = blocks_array(reply, shape, palette)
+        return blocks.transpose(1, 0, 2), list(palette)
+
+    def _tileReplies(self, box, tile, window, palette):
+        """Requests the tiles of box pipelined, at most window at a time, and yields
+        (low corner, codes indexed [x, y, z]) for each as its reply arrives"""
+        lo = [min(box[i], box[i + 3]) for i in range(3)]
+        hi = [max(box[i], box[i + 3]) for i in range(3)]
+        ranges = []
+        for axis in range(3):
+            edges = []
+            start = lo[axis]
+            while start <= hi[axis]:
+                end = min(hi[axis], (start // tile[axis] + 1) * tile[axis] - 1)
+                edges.append((start, end))
+                start = end + 1
+            ranges.append(edges)
+        command = b"world.getBlocksBinary" if supports(self.conn, Connection.BinaryBlocks) else b"world.getBlocks"
+        timeout = getattr(self.conn, "timeout", None)
+        tiles = ((x, y, z) for y in ranges[1] for x in ranges[0] for z in ranges[2])
+        inFlight = collections.deque()
+        for x, y, z in tiles:
+            inFlight.append((x, y, z, self.conn.sendPipelined(command, x[0], y[0], z[0], x[1], y[1], z[1])))
+            if len(inFlight) >= window:
+                yield self._tile(inFlight.popleft(), timeout, palette)
+        while inFlight:
+            yield self._tile(inFlight.popleft(), timeout, palette)
+
+    @staticmethod
+    def _tile(request, timeout, palette):
+        x, y, z, pending = request
+        shape = (y[1] - y[0] + 1, x[1] - x[0] + 1, z[1] - z[0] + 1)
+        return Vec3(x[0], y[0], z[0]), blocks_array(pending.result(timeout), shape, palette).transpose(1, 0, 2)
+
+    def readRegion(self, x0, y0, z0, x1, y1, z1, out = None, tile = (16, 64, 16), window = 8):
+        """Read a large cuboid as chunk-aligned tiles => (blocks, palette) like getBlocksArray.
+        Up to window tiles are requested at once (pipelined) and each one is decoded into
+        blocks as soon as it arrives, so memory stays bounded and decoding overlaps the
+        transfer. out is an optional preallocated uint16 array of shape (nx, ny, nz) to fill.
+        tile is the tile size along x, y and z. Needs numpy"""
+        numpy = require_numpy("readRegion")
+        box = intFloor(x0, y0, z0, x1, y1, z1)
+        lo = Vec3(min(box[0], box[3]), min(box[1], box[4]), min(box[2], box[5]))
+        shape = (abs(box[3] - box[0]) + 1, abs(box[4] - box[1]) + 1, abs(box[5] - box[2]) + 1)
+        if out is None:
+            out = numpy.empty(shape, dtype = numpy.uint16)
+        elif out.shape != shape:
+            raise ValueError("out has shape %s, the region is %s"%(out.shape, shape))
+        palette = {}
+        for origin, blocks in self._tileReplies(box, tile, window, palette):
+            ox, oy, oz = origin.x - lo.x, origin.y - lo.y, origin.z - lo.z
+            nx, ny, nz = blocks.shape
+            out[ox:ox + nx, oy:oy + ny, oz:oz + nz] = blocks
+        return out, list(palette)
+
+    def iterRegion(self, x0, y0, z0, x1, y1, z1, tile = (16, 64, 16), window = 8):
+        """Read a large cuboid tile by tile => generator of (origin, blocks, palette).
+        origin is the Vec3 of the tile's lowest corner, blocks its uint16 array indexed
+        [x, y, z] and palette the material names for the codes seen so far (codes are
+        shared by all tiles). Requests are pipelined like readRegion. Needs numpy"""
+        require_numpy("iterRegion")
+        palette = {}
+        for origin, blocks in self._tileReplies(intFloor(x0, y0, z0, x1, y1, z1), tile, window, palette):
+            yield origin, blocks, list(palette)
+
     def setBlock(self, *args):
         """Set block (x,y,z,material,[data] -  v 1.15.1
         Material must be one of this at :
@@ -1323,7 +1572,7 @@ class Minecraft:
         for arg in flatten(args):
             flatargs.append(arg)
         for flatarg in flatargs[5:]:
-            lines.append(flatarg.replace(",",";").replace(")","]").replace("(","["))
+            lines.append(escape_text(flatarg))
         intFloor(flatargs[0:3])
         self.conn.send(b"world.setSign",flatargs[0:5] , lines)
 
@@ -1685,8 +1934,54 @@ class Minecraft:
         
     def getHeight(self, *args):
         """Get the height of the world (x,z) => int"""
-        #print(args)
-        return int(self.conn.sendReceive(b"world.getHeight", intFloor(args)))
+        pos = intFloor(args)
+        cache = self.cache
+        if cache is None:
+            return int(self.conn.sendReceive(b"world.getHeight", pos))
+        h = cache.height(*pos)
+        if h is None:
+            h, token = self.conn.sendRead(b"world.getHeight", pos)
+            h = int(h)
+            cache.putHeight(pos[0], pos[1], h, token)
+        return h
+
+    def getHeightMap(self, x0, z0, x1, z1, window = 512):
+        """Get the heights of all columns of a rectangle (x0,z0,x1,z1) => numpy int32 array
+        indexed [x, z] from the lowest corner. The columns are requested pipelined, up to
+        window at a time. With cacheWorld on, cached heights are used and the fetched ones
+        are stored, per chunk; writes to a column invalidate it. Needs numpy"""
+        numpy = require_numpy("getHeightMap")
+        x0, z0, x1, z1 = intFloor(x0, z0, x1, z1)
+        x0, x1 = min(x0, x1), max(x0, x1)
+        z0, z1 = min(z0, z1), max(z0, z1)
+        nz = z1 - z0 + 1
+        out = numpy.empty((x1 - x0 + 1, nz), dtype = numpy.int32)
+        flat = out.reshape(-1)
+        cache = self.cache
+        if cache is None:
+            known = [None] * out.size
+        else:
+            known = cache.heights(x0, z0, x1, z1)
+        timeout = getattr(self.conn, "timeout", None)
+        inFlight = collections.deque()
+
+        def complete():
+            i, pending = inFlight.popleft()
+            h = int(pending.result(timeout))
+            flat[i] = h
+            if cache is not None:
+                cache.putHeight(x0 + i // nz, z0 + i % nz, h, pending.token)
+
+        for i, h in enumerate(known):
+            if h is not None:
+                flat[i] = h
+                continue
+            inFlight.append((i, self.conn.sendPipelined(b"world.getHeight", x0 + i // nz, z0 + i % nz)))
+            if len(inFlight) >= window:
+                complete()
+        while inFlight:
+            complete()
+        return out
 
     def getPlayerEntityIds(self):
         """Get the entity ids of the connected players => [id:int]"""
@@ -1711,8 +2006,13 @@ class Minecraft:
         self.conn.send(b"world.checkpoint.restore")
 
     def postToChat(self, msg):
-        """Post a message to the game chat"""
-        self.conn.send(b"chat.post", msg)
+        """Post a message to the game chat. Multi-line and long messages, or a list of
+        messages, are split into chat lines that go out in a single write"""
+        lines = chat_lines(msg, Minecraft.ChatLineLength)
+        if len(lines) == 1:
+            self.conn.send(b"chat.post", lines[0])
+        else:
+            self.conn.sendMany(b"chat.post", [(line,) for line in lines])
 
     def setting(self, setting, status):
         """Set a world setting (setting, status). keys: world_immutable, nametags_visible"""
@@ -1725,11 +2025,11 @@ class Minecraft:
         #return [Entity(int(e[:e.find(",")]), e[e.find(",") + 1:]) for e in types]
         return [e for e in types]
 
-    def getEntities(self, typeId=""):
-        """Return a list of all currently loaded entities (EntityType:str) => [[entityId:int,entityTypeId:int,entityTypeName:str,posX:float,posY:float,posZ:float]]"""
+    def getEntities(self, typeId="", columns = False):
+        """Return a list of all currently loaded entities (EntityType:str) => [EntityRecord(id:int,type:str,x:float,y:float,z:float)].
+        With columns = True => EntityColumns of numpy arrays (needs numpy)"""
         s = self.conn.sendReceive(b"world.getEntities", typeId)
-        entities = [e for e in s.split("|") if e]
-        return [[int(n.split(",")[0]), n.split(",")[1], float(n.split(",")[2]), float(n.split(",")[3]), float(n.split(",")[4])] for n in entities]
+        return EntityColumns.parse(s) if columns else EntityRecord.parse(s)
            
     def removeEntity(self, id):
         """Remove entity Id (entityId:int) => (removedEntitiesCount:int)"""
@@ -1741,11 +2041,16 @@ class Minecraft:
 
     def setEntityName(self, id, name):
         """Give a name visible to an entity Id (entityId:int), name (Name to the entity : str) => (bool:true)"""
-        return bool(self.conn.sendReceive(b"world.setEntityName", int(id),name))        
+        return bool(self.conn.sendReceive(b"world.setEntityName", int(id), escape_line(name)))        
         
     @staticmethod
-    def create(address = "localhost", port = 4711):
-        return Minecraft(Connection(address, port))
+    def create(address = "localhost", port = 4711, pool = 1, timeout = None):
+        """Connect to a server => Minecraft. With pool > 1 the connection is a
+        ConnectionPool of that many sockets, used by Minecraft.map. With a timeout
+        queries raise RequestTimeout after waiting that many seconds for a reply"""
+        if pool > 1:
+            return Minecraft(ConnectionPool(address, port, pool, timeout))
+        return Minecraft(Connection(address, port, timeout))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,197 @@
+import copy
+import time
+from .connection import RequestTimeout
+
+""" Pipelined command calls
+
+    A Pipeline wraps a Minecraft, CmdEntity or CmdPlayer object.  Calling one of its
+    methods through the pipeline sends the request straight away and returns a
+    PendingCall instead of waiting for the reply, so N queries cost roughly one round
+    trip instead of N.
+
+    The command methods are not rewritten for this.  Each call is run against a
+    _ReplayConnection that sends requests through the real connection and stops the
+    method (by raising _Deferred) as soon as it needs a reply that has not arrived
+    yet.  Once the reply is in, the method is run again from the start: requests that
+    were already sent are skipped and the replies that are already known are handed
+    back, so the method's own parsing produces the result.  This relies on the
+    command methods being deterministic, which they are.
+"""
+
+class _Deferred(Exception):
+    """Raised inside a replayed method when a reply is not available yet"""
+    pass
+
+def bind(target, conn):
+    """
+    Returns a shallow copy of a Minecraft, CmdEntity or CmdPlayer object that talks
+    through conn instead of its own connection
+    """
+    bound = copy.copy(target)
+    bound.conn = conn
+    return bound
+
+class _ReplayConnection:
+    """Connection stand-in used while a PendingCall runs its method"""
+    def __init__(self, call):
+        self._call = call
+        self._sends = 0
+        self._receives = 0
+
+    def send(self, f, *data):
+        call = self._call
+        if self._sends == call.sent:
+            call.conn.send(f, *data)
+            call.sent += 1
+        self._sends += 1
+
+    def sendMany(self, f, argsList):
+        call = self._call
+        if self._sends == call.sent:
+            call.conn.sendMany(f, argsList)
+            call.sent += 1
+        self._sends += 1
+
+    def sendCommands(self, commands):
+        call = self._call
+        if self._sends == call.sent:
+            call.conn.sendCommands(commands)
+            call.sent += 1
+        self._sends += 1
+
+    def sendReceive(self, f, *data):
+        call = self._call
+        if self._receives == len(call.responses):
+            call.responses.append(call.conn.sendPipelined(f, *data))
+            self._receives += 1
+            raise _Deferred()
+        response = call.responses[self._receives]
+        self._receives += 1
+        if not response.done:
+            raise _Deferred()
+        return response.result()
+
+    def sendRead(self, f, *data):
+        # the token of the request as it was sent, not of the replay
+        reply = self.sendReceive(f, *data)
+        return reply, getattr(self._call.responses[self._receives - 1], "token", None)
+
+    def __getattr__(self, name):
+        return getattr(self._call.conn, name)
+
+class PendingCall:
+    """
+    Result slot for a method called through a :class:`Pipeline`
+
+    :param conn: the connection the requests are sent through
+    :type conn: mcpython.connection.Connection
+    :param target: the Minecraft, CmdEntity or CmdPlayer object the method belongs to
+    :param name: method name
+    :type name: str
+    """
+    def __init__(self, conn, target, name, args = (), kwargs = None):
+        self.conn = conn
+        self.target = target
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.sent = 0
+        self.responses = []
+        self.done = False
+        self._value = None
+        self._error = None
+        self._step()
+
+    def _step(self):
+        bound = bind(self.target, _ReplayConnection(self))
+        try:
+            self._value = getattr(bound, self.name)(*self.args, **self.kwargs)
+        except _Deferred:
+            return
+        except Exception as e:
+            self._error = e
+        self.done = True
+
+    def wait(self, timeout = None):
+        """
+        Blocks until the method has run to completion.  If that takes longer than 
+        timeout seconds (default: the connection's timeout) the call is given up and 
+        its result is a :class:`mcpython.connection.RequestTimeout`.
+        """
+        if timeout is None:
+            timeout = getattr(self.conn, "timeout", None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.done:
+            response = self.responses[-1]
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not response.wait(remaining):
+                response.cancel(RequestTimeout("%s timed out"%self.name))
+                self._error = RequestTimeout("%s timed out"%self.name)
+                self.done = True
+                return
+            self._step()
+
+    def result(self, timeout = None):
+        """
+        :return: whatever the method returns when called directly
+
+        :raises Exception: whatever the method raised, e.g. RequestError
+        :raises RequestTimeout: if the method did not complete within timeout seconds
+        """
+        self.wait(timeout)
+        return self._outcome()
+
+    def _outcome(self):
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def __repr__(self):
+        state = "done" if self.done else "pending"
+        return "PendingCall(%s, %s)"%(self.name, state)
+
+class Pipeline:
+    """
+    Proxy for a Minecraft, CmdEntity or CmdPlayer object whose method calls return
+    :class:`PendingCall` slots instead of results.  Use it as a context manager to
+    collect all replies when the block ends::
+
+        with mc.pipeline() as p:
+            heights = [p.getHeight(x, 0) for x in range(100)]
+        heights = [h.result() for h in heights]
+
+    :param target: the object whose methods are pipelined
+    """
+    def __init__(self, target):
+        self._target = target
+        self._calls = []
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            pending = PendingCall(self._target.conn, self._target, name, args, kwargs)
+            self._calls.append(pending)
+            return pending
+        return call
+
+    def collect(self):
+        """
+        Waits for every call made through this pipeline
+
+        :return: the calls in the order they were made
+        :rtype: list
+        """
+        for call in self._calls:
+            call.wait()
+        calls, self._calls = self._calls, []
+        return calls
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.collect()
+        return False
@@ -0,0 +1,134 @@
+from concurrent.futures import ThreadPoolExecutor
+from .connection import Connection, RequestError
+from .pipeline import Pipeline, bind
+
+""" Connection pool
+
+    A ConnectionPool holds several sockets to the same server.  It behaves like a
+    single Connection for ordinary calls, which all go through the first (primary)
+    socket in order.  ConnectionPool.map spreads many independent reads over all the
+    sockets, each one pipelined, from a thread pool.
+
+        mc = Minecraft.create("localhost", 4711, pool = 4)
+        materials = mc.map(mc.getBlock, [(x, 64, z) for x in range(64) for z in range(64)])
+"""
+
+def _args(item):
+    """A map argument is a tuple/list of positional arguments or a single argument"""
+    return tuple(item) if isinstance(item, (tuple, list)) else (item,)
+
+def _methodName(method):
+    return method if isinstance(method, str) else method.__name__
+
+def pipelineMap(target, method, argsList):
+    """
+    Calls method on target once per entry of argsList without waiting between calls
+
+    :param target: a Minecraft, CmdEntity or CmdPlayer object
+    :param method: method name or bound method of target
+    :param argsList: argument tuples (or single arguments)
+    :return: the results in the order of argsList
+    :rtype: list
+    """
+    name = _methodName(method)
+    with Pipeline(target) as p:
+        calls = [getattr(p, name)(*_args(item)) for item in argsList]
+    return [c.result() for c in calls]
+
+class ConnectionPool:
+    """
+    Several connections to one Minecraft game
+
+    :param address: server address
+    :type address: str
+    :param port: server port
+    :type port: int
+    :param size: number of sockets -- (default 4)
+    :type size: int
+    :param timeout: reply timeout of every socket, see :class:`mcpython.connection.Connection` -- (default None)
+    :type timeout: float
+    """
+    SyncCommand = b"world.getPlayerIds"
+
+    def __init__(self, address, port, size = 4, timeout = None):
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        self.connections = [Connection(address, port, timeout) for _ in range(size)]
+        self.primary = self.connections[0]
+        self._executor = None
+        self._unsynced = False
+
+    def __len__(self):
+        return len(self.connections)
+
+    def send(self, f, *data):
+        self._unsynced = True
+        self.primary.send(f, *data)
+
+    def sendMany(self, f, argsList):
+        self._unsynced = True
+        self.primary.sendMany(f, argsList)
+
+    def sendCommands(self, commands):
+        self._unsynced = True
+        self.primary.sendCommands(commands)
+
+    def sendPipelined(self, f, *data):
+        self._unsynced = True
+        return self.primary.sendPipelined(f, *data)
+
+    def sendReceive(self, *data, timeout = None):
+        s = self.primary.sendReceive(*data, timeout = timeout)
+        self._unsynced = False
+        return s
+
+    def sendRead(self, *data, timeout = None):
+        read = self.primary.sendRead(*data, timeout = timeout)
+        self._unsynced = False
+        return read
+
+    def __getattr__(self, name):
+        return getattr(self.primary, name)
+
+    def sync(self):
+        """
+        Waits until the server has processed everything sent on the primary socket,
+        so reads on the other sockets see those writes
+        """
+        if not self._unsynced:
+            return
+        try:
+            self.primary.sendReceive(ConnectionPool.SyncCommand)
+        except RequestError:
+            pass
+        self._unsynced = False
+
+    def map(self, target, method, argsList):
+        """
+        Calls method on target once per entry of argsList, spread over all sockets
+
+        :param target: a Minecraft, CmdEntity or CmdPlayer object using this pool
+        :param method: method name or bound method of target
+        :param argsList: argument tuples (or single arguments)
+        :return: the results in the order of argsList
+        :rtype: list
+        """
+        argsList = list(argsList)
+        self.sync()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers = len(self.connections))
+        n = len(self.connections)
+        step = -(-len(argsList) // n) or 1
+        futures = [self._executor.submit(pipelineMap, bind(target, conn), method, argsList[i:i + step])
+                   for conn, i in zip(self.connections, range(0, len(argsList), step))]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for conn in self.connections:
+            conn.close()
@@ -0,0 +1,177 @@
+import threading
+import time
+
+""" Adaptive rate control for bulk command streams
+
+    Turned on with Connection.rateLimit().  Every command sent through the connection
+    takes a token from a token bucket refilled at self.rate commands per second.
+    Every probeInterval seconds a cheap probe request goes out along with the stream;
+    since the server answers in order, its round trip time includes the server's
+    backlog.  While probes come back within the target latency the rate grows a
+    little, and as soon as one is late (or is still outstanding past the target) the
+    rate is cut by 30% -- additive increase, multiplicative decrease, like TCP.  That
+    keeps the server just below the point where its tick falls behind.
+
+        limiter = mc.conn.rateLimit()
+        limiter.setCeiling("world.setBlocks", 50)
+        ...
+        print(limiter.rate, limiter.rtt)
+"""
+
+_Sending = object()
+
+class RateController:
+    """
+    Token bucket whose rate follows the measured round trip time of probes
+
+    :param conn: the connection to pace
+    :type conn: mcpython.connection.Connection
+    :param rate: starting rate in commands per second -- (default 1000.0)
+    :type rate: float
+    :param minRate: lowest rate -- (default 20.0)
+    :type minRate: float
+    :param maxRate: highest rate -- (default 100000.0)
+    :type maxRate: float
+    :param burst: seconds worth of tokens that may be saved up -- (default 0.05)
+    :type burst: float
+    :param probeInterval: seconds between probes -- (default 0.2)
+    :type probeInterval: float
+    :param targetLatency: probe round trip time considered saturated, in seconds -- (default None:
+        twice the fastest recent round trip plus 5 ms)
+    :type targetLatency: float
+    """
+    ProbeCommand = b"world.getPlayerIds"
+    Increase = 0.05
+    Decrease = 0.7
+
+    def __init__(self, conn, rate = 1000.0, minRate = 20.0, maxRate = 100000.0, burst = 0.05,
+                 probeInterval = 0.2, targetLatency = None):
+        self.conn = conn
+        self.rate = float(rate)
+        self.minRate = float(minRate)
+        self.maxRate = float(maxRate)
+        self.burst = burst
+        self.probeInterval = probeInterval
+        self.targetLatency = targetLatency
+        self.rtt = None
+        self.baseRtt = None
+        self.probes = 0
+        self.decreases = 0
+        self.ceilings = {}
+        self._families = {}
+        self._bucket = [self.rate * burst, time.perf_counter()]
+        self._buckets = {}
+        self._probe = None
+        self._probeSent = 0.0
+        self._lastDecrease = 0.0
+        self._lock = threading.Lock()
+
+    def setCeiling(self, family, rate):
+        """
+        Limits a family of commands to at most rate per second, on top of the overall rate
+
+        :param family: a command name ("world.setBlocks") or a prefix ending in "." ("entity.")
+        :type family: str
+        :param rate: commands per second, None removes the ceiling
+        :type rate: float
+        """
+        if isinstance(family, str):
+            family = family.encode("UTF-8")
+        with self._lock:
+            if rate is None:
+                self.ceilings.pop(family, None)
+                self._buckets.pop(family, None)
+            else:
+                self.ceilings[family] = float(rate)
+                self._buckets[family] = [rate * self.burst, time.perf_counter()]
+            self._families = {}
+
+    def target(self):
+        """Probe round trip time above which the rate is reduced, in seconds"""
+        if self.targetLatency is not None:
+            return self.targetLatency
+        if self.baseRtt is None:
+            return 0.1
+        return 2 * self.baseRtt + 0.005
+
+    def acquire(self, f):
+        """Blocks until command f may be sent.  Called by the connection for every command."""
+        if self._probe is _Sending and f == self.ProbeCommand:
+            # the probe itself goes straight out, waiting would skew its round trip time
+            return
+        now = time.perf_counter()
+        self._checkProbe(now)
+        with self._lock:
+            wait = self._reserve(self._bucket, self.rate, now)
+            family = self._families.get(f, False)
+            if family is False:
+                family = self._family(f)
+            if family is not None:
+                rate = min(self.ceilings[family], self.rate)
+                wait = max(wait, self._reserve(self._buckets[family], rate, now))
+        if wait > 0:
+            time.sleep(wait)
+
+    def _family(self, f):
+        family = None
+        for name in self.ceilings:
+            if (f == name or name.endswith(b".") and f.startswith(name)) and \
+               (family is None or len(name) > len(family)):
+                family = name
+        self._families[f] = family
+        return family
+
+    def _reserve(self, bucket, rate, now):
+        """Takes a token, possibly going into debt; returns how long to wait for it"""
+        tokens = min(max(rate * self.burst, 1.0), bucket[0] + (now - bucket[1]) * rate) - 1
+        bucket[0] = tokens
+        bucket[1] = now
+        return -tokens / rate if tokens < 0 else 0.0
+
+    def _checkProbe(self, now):
+        probe = self._probe
+        if probe is _Sending:
+            return
+        if probe is not None:
+            if probe.done:
+                self._probe = None
+                if not isinstance(probe._error, ConnectionError):
+                    self._adapt(probe.receivedAt - self._probeSent)
+            elif now - self._probeSent > self.target() and now - self._lastDecrease > self.target():
+                self._decrease(now)
+            return
+        if now - self._probeSent < self.probeInterval:
+            return
+        with self._lock:
+            if self._probe is not None:
+                return
+            self._probe = _Sending
+        self._probeSent = time.perf_counter()
+        try:
+            probe = self.conn.sendPipelined(self.ProbeCommand)
+        except Exception:
+            self._probe = None
+            raise
+        self.probes += 1
+        self._probe = probe
+
+    def _adapt(self, rtt):
+        self.rtt = rtt
+        if self.baseRtt is None or rtt < self.baseRtt:
+            self.baseRtt = rtt
+        else:
+            # forget old minimums slowly, in case the network path got slower
+            self.baseRtt *= 1.01
+        if rtt > self.target():
+            self._decrease(time.perf_counter())
+        else:
+            self.rate = min(self.maxRate, self.rate * (1 + RateController.Increase) + self.minRate)
+
+    def _decrease(self, now):
+        self._lastDecrease = now
+        self.decreases += 1
+        self.rate = max(self.minRate, self.rate * RateController.Decrease)
+
+    def __repr__(self):
+        rtt = "-" if self.rtt is None else "%.1fms"%(self.rtt * 1000)
+        return "RateController(rate=%.0f/s, rtt=%s)"%(self.rate, rtt)
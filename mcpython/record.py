@@ -0,0 +1,202 @@
+import socket
+import struct
+import threading
+import time
+from .connection import BinaryReply, LineReader
+
+""" Recording and replaying command streams
+
+    A Recorder hooks Connection._send and the connection's reply dispatch and writes
+    every chunk of bytes sent and every reply line received, each with its time since
+    the recording started, to a compact binary file.  replay() sends a recording to a
+    server (or a mcpython.server.StandInServer) again, as fast as possible or at the
+    recorded pace, and reports how long it took and whether the replies matched.
+
+        with Recorder(mc.conn, "build.mcrec"):
+            build(mc)
+
+        result = replay("build.mcrec", "localhost", 4711)
+        print(result.elapsed, result.replies, result.mismatches)
+
+    File format: the 8 byte magic "MCPYREC1", then one record per event: kind (1 byte,
+    0 = sent, 1 = reply, 2 = binary reply), time in seconds (float64), payload length
+    (uint32), payload.  All numbers are little endian.  Sent payloads are the raw bytes
+    handed to Connection._send; reply payloads are UTF-8 lines without the newline,
+    binary reply payloads the payload of a binary frame (see
+    mcpython.connection.BinaryReply).
+"""
+
+Magic = b"MCPYREC1"
+Sent = 0
+Reply = 1
+Binary = 2
+_Record = struct.Struct("<BdI")
+
+def readRecording(path):
+    """
+    Reads a recording
+
+    :return: (kind, seconds since the start, payload bytes) for each event, in order
+    :rtype: generator
+    """
+    with open(path, "rb") as f:
+        if f.read(len(Magic)) != Magic:
+            raise ValueError("%s is not a mcpython recording"%path)
+        while True:
+            header = f.read(_Record.size)
+            if len(header) < _Record.size:
+                return
+            kind, t, n = _Record.unpack(header)
+            yield kind, t, f.read(n)
+
+class Recorder:
+    """
+    Captures the traffic of a Connection into a file.  Use it as a context manager or
+    call :func:`start` and :func:`stop`.
+
+    :param conn: the connection to record
+    :type conn: mcpython.connection.Connection
+    :param path: file to write
+    :type path: str
+    """
+    def __init__(self, conn, path):
+        self.conn = conn
+        self.path = path
+        self.sent = 0
+        self.replies = 0
+        self._file = None
+        self._start = 0.0
+        self._lock = threading.Lock()
+        self._hooked = {}
+
+    def start(self):
+        self._file = open(self.path, "wb")
+        self._file.write(Magic)
+        self._start = time.perf_counter()
+        conn = self.conn
+        send = conn._send
+        dispatch = conn._dispatch
+
+        def _send(s):
+            self._write(Sent, s)
+            send(s)
+
+        def _dispatch(s):
+            if s.__class__ is BinaryReply:
+                self._write(Binary, s)
+            else:
+                self._write(Reply, s.encode("UTF-8"))
+            dispatch(s)
+
+        for name, hook in (("_send", _send), ("_dispatch", _dispatch)):
+            self._hooked[name] = conn.__dict__.get(name)
+            setattr(conn, name, hook)
+        return self
+
+    def stop(self):
+        """Removes the hooks and closes the file"""
+        for name, previous in self._hooked.items():
+            if previous is None:
+                self.conn.__dict__.pop(name, None)
+            else:
+                setattr(self.conn, name, previous)
+        self._hooked = {}
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self, kind, data):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(_Record.pack(kind, time.perf_counter() - self._start, len(data)))
+            self._file.write(data)
+            if kind == Sent:
+                self.sent += data.count(b"\n")
+            else:
+                self.replies += 1
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+class ReplayResult:
+    """Outcome of :func:`replay`"""
+    def __init__(self):
+        self.commands = 0
+        self.bytesSent = 0
+        self.expected = 0
+        self.replies = 0
+        self.mismatches = 0
+        self.firstMismatches = []
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return "ReplayResult(commands=%d, replies=%d/%d, mismatches=%d, elapsed=%.3fs)"%(
+            self.commands, self.replies, self.expected, self.mismatches, self.elapsed)
+
+def replay(path, address = "localhost", port = 4711, pace = False, speed = 1.0, timeout = 10.0):
+    """
+    Sends a recording to a server again and reads the replies
+
+    :param path: recording written by :class:`Recorder`
+    :type path: str
+    :param pace: keep the recorded gaps between writes, otherwise send as fast as possible -- (default False)
+    :type pace: bool
+    :param speed: with pace, replay this many times faster than recorded -- (default 1.0)
+    :type speed: float
+    :param timeout: give up when no reply arrives for this many seconds -- (default 10.0)
+    :type timeout: float
+
+    :return: counts, timing and the first few replies that differ from the recording
+    :rtype: ReplayResult
+
+    :Note: Replies that depend on server state, e.g. entity ids, are expected to differ
+        when the world is not the one that was recorded.
+    """
+    events = list(readRecording(path))
+    chunks = [(t, data) for kind, t, data in events if kind == Sent]
+    expected = [data.decode("UTF-8", "replace") if kind == Reply else BinaryReply(data)
+                for kind, t, data in events if kind != Sent]
+    result = ReplayResult()
+    result.commands = sum(data.count(b"\n") for t, data in chunks)
+    result.bytesSent = sum(len(data) for t, data in chunks)
+    result.expected = len(expected)
+    sock = socket.create_connection((address, port))
+    reader = LineReader(sock)
+
+    def send():
+        begin = time.perf_counter()
+        for t, data in chunks:
+            if pace:
+                delay = begin + t / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            sock.sendall(data)
+
+    sock.settimeout(timeout)
+    sender = threading.Thread(target = send, name = "mcpython-replay", daemon = True)
+    begin = time.perf_counter()
+    sender.start()
+    try:
+        while result.replies < len(expected):
+            s = reader.pop()
+            if s is None:
+                if not reader.fill():
+                    break
+                continue
+            if s != expected[result.replies]:
+                result.mismatches += 1
+                if len(result.firstMismatches) < 10:
+                    result.firstMismatches.append((result.replies, expected[result.replies], s))
+            result.replies += 1
+    except socket.timeout:
+        pass
+    sender.join()
+    result.elapsed = time.perf_counter() - begin
+    sock.close()
+    return result
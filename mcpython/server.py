@@ -0,0 +1,693 @@
+import argparse
+import copy
+import math
+import socketserver
+import sys
+import threading
+from .connection import Connection, binaryFrame
+from .util import pack_block_palette
+
+""" In-memory stand-in server
+
+    A small pure-Python server that speaks the same line protocol as the
+    MCPythonMod / RaspberryJuice plugins, so scripts, tests and benchmarks can run
+    offline at full speed.  It keeps an in-memory voxel world (a flat world with
+    the ground at y = groundLevel - 1), entities, players and event queues, and
+    implements the world.*, entity.*, player.*, multiplayer.*, events.* and
+    chat.post commands used by mcpython.minecraft.
+
+        server = StandInServer(port = 0, players = ("steve",)).start()
+        mc = Minecraft.create("localhost", server.port)
+        ...
+        server.stop()
+
+    Or from a shell:  python -m mcpython.server --port 4711 --player steve
+
+    Commands that the client sends without waiting for a reply never get one, even
+    when they fail; failures are kept in server.errors.  Unknown commands are
+    answered with "Fail", like the real plugins do.
+
+    It also implements the optional binary extensions (mcpython.capabilities and
+    world.getBlocksBinary, see Connection.capabilities); pass capabilities = () to
+    get a plain text server.
+"""
+
+Fail = "Fail"
+
+# Commands the client sends with Connection.send (no reply)
+Silent = {
+    "world.setBlock", "world.setBlocks", "world.setBlockDir", "world.setBlockMultiFace",
+    "world.setBlockOrient", "world.setBlockRotat", "world.setBlockAge", "world.setBlockBisected",
+    "world.setBlockSapl", "world.setBlockLevel", "world.setSign", "world.setBed", "world.setGate",
+    "world.setDoor", "world.setTrapDoor", "world.setPane", "world.setFence", "world.setChest",
+    "world.setFurnace", "world.setSlab", "world.setStairs", "world.checkpoint.save",
+    "world.checkpoint.restore", "world.setting", "chat.post", "events.clear",
+    "setPos", "setTile", "setDirection", "setRotation", "setPitch", "setting", "events.clear"}
+
+EntityTypes = (
+    "ELDER_GUARDIAN", "WITHER_SKELETON", "STRAY", "HUSK", "ZOMBIE_VILLAGER", "SKELETON_HORSE",
+    "ZOMBIE_HORSE", "ARMOR_STAND", "DONKEY", "MULE", "EVOKER", "VEX", "VINDICATOR", "CREEPER",
+    "SKELETON", "SPIDER", "GIANT", "ZOMBIE", "SLIME", "GHAST", "ENDERMAN", "CAVE_SPIDER",
+    "SILVERFISH", "BLAZE", "MAGMA_CUBE", "ENDER_DRAGON", "WITHER", "BAT", "WITCH", "ENDERMITE",
+    "GUARDIAN", "SHULKER", "PIG", "SHEEP", "COW", "CHICKEN", "SQUID", "WOLF", "MUSHROOM_COW",
+    "SNOWMAN", "OCELOT", "IRON_GOLEM", "HORSE", "RABBIT", "POLAR_BEAR", "LLAMA", "PARROT",
+    "VILLAGER", "TURTLE", "PHANTOM", "COD", "SALMON", "PUFFERFISH", "TROPICAL_FISH", "DROWNED",
+    "DOLPHIN", "CAT", "PANDA", "PILLAGER", "RAVAGER", "TRADER_LLAMA", "WANDERING_TRADER", "FOX",
+    "BEE")
+
+def _bool(s):
+    return str(s).lower() == "true"
+
+def _str(v):
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    return str(v)
+
+class World:
+    """
+    Voxel storage.  Blocks are (material, properties) pairs where properties is a
+    sorted tuple of (name, value) pairs; anything never set comes from a flat
+    generator: AIR at and above groundLevel, GRASS_BLOCK just below it, then DIRT
+    and STONE down to minY.
+    """
+    def __init__(self, groundLevel = 0, minY = -64, maxY = 319):
+        self.groundLevel = groundLevel
+        self.minY = minY
+        self.maxY = maxY
+        self.blocks = {}
+        self.columns = {}
+        self.signs = {}
+
+    def generated(self, y):
+        if y >= self.groundLevel or y < self.minY:
+            return "AIR"
+        if y == self.groundLevel - 1:
+            return "GRASS_BLOCK"
+        if y >= self.groundLevel - 4:
+            return "DIRT"
+        return "STONE"
+
+    def get(self, x, y, z):
+        block = self.blocks.get((x, y, z))
+        if block is None:
+            return (self.generated(y), ())
+        return block
+
+    def set(self, x, y, z, material, props = ()):
+        self.blocks[(x, y, z)] = (material.upper(), tuple(sorted(props)))
+        self.columns.setdefault((x, z), set()).add(y)
+        self.signs.pop((x, y, z), None)
+
+    def height(self, x, z):
+        """Highest y holding something other than AIR"""
+        top = self.groundLevel - 1
+        explicit = self.columns.get((x, z), ())
+        for y in sorted(explicit, reverse = True):
+            if y <= top:
+                break
+            if self.get(x, y, z)[0] != "AIR":
+                return y
+        y = top
+        while y >= self.minY and self.get(x, y, z)[0] == "AIR":
+            y -= 1
+        return y
+
+    @staticmethod
+    def asString(block):
+        """Block data in Bukkit's BlockData.getAsString() form"""
+        material, props = block
+        s = "minecraft:" + material.lower()
+        if props:
+            s += "[" + ",".join("%s=%s"%(k, v) for k, v in props) + "]"
+        return s
+
+class StandInEntity:
+    """An entity (or player) of the stand-in world"""
+    def __init__(self, id, type, x, y, z, name = None):
+        self.id = id
+        self.type = type
+        self.x = x
+        self.y = y
+        self.z = z
+        self.yaw = 0.0
+        self.pitch = 0.0
+        self.name = name
+        self.age = 0
+        self.ageLock = False
+        self.tamed = False
+        self.owner = None
+        self.domestication = 0
+        self.maxDomestication = 100
+        self.jumpStrength = 0.7
+        self.attributes = {}
+
+    def distanceTo(self, other):
+        return math.sqrt((self.x - other.x) ** 2 + (self.y - other.y) ** 2 + (self.z - other.z) ** 2)
+
+class StandInServer:
+    """
+    In-memory Minecraft server for tests and benchmarks
+
+    :param address: address to listen on -- (default "localhost")
+    :type address: str
+    :param port: port to listen on, 0 picks a free one -- (default 4711)
+    :type port: int
+    :param players: names of the players that are online -- (default ("steve",))
+    :type players: tuple
+    :param groundLevel: lowest y of the air above the flat ground -- (default 0)
+    :type groundLevel: int
+    :param capabilities: optional protocol features to announce, empty for a plain 
+        text server -- (default {Connection.BinaryBlocks})
+    :type capabilities: set
+    """
+    def __init__(self, address = "localhost", port = 4711, players = ("steve",), groundLevel = 0,
+                 capabilities = None):
+        self.address = address
+        self.port = port
+        self.capabilities = set((Connection.BinaryBlocks,) if capabilities is None else capabilities)
+        self.world = World(groundLevel)
+        self.entities = {}
+        self.blockHits = []
+        self.chatPosts = []
+        self.projectileHits = []
+        self.chatLog = []
+        self.settings = {}
+        self.errors = []
+        self.commands = 0
+        self.lock = threading.RLock()
+        self._nextId = 1
+        self._checkpoint = None
+        self._server = None
+        for name in players:
+            self.addPlayer(name)
+
+    # -------------------------------------- LIFECYCLE --------------------------------------
+
+    def start(self):
+        """Starts serving from a background thread => self"""
+        standIn = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    reply = standIn.handle(line.decode("UTF-8", "replace").rstrip("\r\n"))
+                    if isinstance(reply, bytes):
+                        self.wfile.write(reply)
+                    elif reply is not None:
+                        self.wfile.write(reply.encode("UTF-8") + b"\n")
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self._server = Server((self.address, self.port), Handler)
+        self.port = self._server.server_address[1]
+        thread = threading.Thread(target = self._server.serve_forever, name = "mcpython-standin", daemon = True)
+        thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    # -------------------------------------- STATE --------------------------------------
+
+    def addEntity(self, type, x, y, z, name = None):
+        with self.lock:
+            entity = StandInEntity(self._nextId, type.upper(), float(x), float(y), float(z), name)
+            self._nextId += 1
+            self.entities[entity.id] = entity
+            return entity
+
+    def addPlayer(self, name, x = 0.5, y = None, z = 0.5):
+        """Puts a player online, standing on the ground by default"""
+        if y is None:
+            y = self.world.groundLevel
+        return self.addEntity("PLAYER", x, y, z, name)
+
+    @property
+    def players(self):
+        return [e for e in self.entities.values() if e.type == "PLAYER"]
+
+    def player(self, name):
+        for p in self.players:
+            if p.name == name:
+                return p
+        return None
+
+    def hitBlock(self, x, y, z, face = 1, player = None):
+        """Records a sword hit on a block, as if player (name, default first player) did it"""
+        with self.lock:
+            p = self.player(player) if player else self.players[0]
+            self.blockHits.append((x, y, z, face, p.id))
+
+    def postChat(self, player, message):
+        """Records a chat message posted by a player"""
+        with self.lock:
+            self.chatPosts.append((self.player(player).id, message))
+
+    def hitProjectile(self, x, y, z, player = None, target = None):
+        """Records a projectile shot by player hitting a block, or the entity target"""
+        with self.lock:
+            p = self.player(player) if player else self.players[0]
+            if target is None:
+                self.projectileHits.append((x, y, z, p.name, 0, ""))
+            else:
+                self.projectileHits.append((x, y, z, p.name, target.id, target.type))
+
+    # -------------------------------------- PROTOCOL --------------------------------------
+
+    def handle(self, line):
+        """
+        Executes one protocol line
+
+        :return: the reply, or None for commands that get no reply
+        :rtype: str, or bytes for a binary frame
+        """
+        if not line:
+            return None
+        try:
+            paren = line.index("(")
+            name = line[:paren]
+            argstr = line[paren + 1:line.rindex(")")]
+        except ValueError:
+            self.errors.append((line, "malformed command"))
+            return None
+        args = argstr.split(",") if argstr else []
+        pkg, _, command = name.partition(".")
+        if pkg in ("entity", "player", "multiplayer"):
+            method = getattr(self, "_entity_" + command.replace(".", "_"), None)
+            silent = command in Silent
+        else:
+            method = getattr(self, "_" + name.replace(".", "_"), None)
+            silent = name in Silent
+        if method is None:
+            return Fail
+        with self.lock:
+            self.commands += 1
+            try:
+                if method.__name__.startswith("_entity_"):
+                    if pkg == "player":
+                        entity = self.players[0]
+                    else:
+                        entity = self.entities[int(args.pop(0))]
+                    reply = method(entity, args)
+                else:
+                    reply = method(args)
+            except Exception as e:
+                self.errors.append((line, repr(e)))
+                return None if silent else Fail
+        if silent:
+            return None
+        return reply if isinstance(reply, bytes) else _str(reply)
+
+    @staticmethod
+    def _ints(args, n = 3):
+        return [int(math.floor(float(a))) for a in args[:n]]
+
+    def _blockArgs(self, args, names):
+        """x, y, z, material, then block data properties in the order of names"""
+        x, y, z = self._ints(args)
+        props = [(n, a.lower()) for n, a in zip(names, args[4:]) if a != ""]
+        self.world.set(x, y, z, args[3], props)
+
+    def _mcpython_capabilities(self, args):
+        return ",".join(sorted(self.capabilities))
+
+    # -------------------------------------- WORLD --------------------------------------
+
+    def _world_getBlock(self, args):
+        return self.world.get(*self._ints(args))[0]
+
+    def _world_getBlockWithData(self, args):
+        return World.asString(self.world.get(*self._ints(args)))
+
+    def _cuboid(self, args):
+        """Materials of a cuboid, in y, x, z order"""
+        x0, y0, z0, x1, y1, z1 = self._ints(args, 6)
+        get = self.world.get
+        return [get(x, y, z)[0]
+                for y in range(min(y0, y1), max(y0, y1) + 1)
+                for x in range(min(x0, x1), max(x0, x1) + 1)
+                for z in range(min(z0, z1), max(z0, z1) + 1)]
+
+    def _world_getBlocks(self, args):
+        return ",".join(self._cuboid(args))
+
+    def _world_getBlocksBinary(self, args):
+        if Connection.BinaryBlocks not in self.capabilities:
+            raise LookupError("binary block transfers are turned off")
+        return binaryFrame(pack_block_palette(self._cuboid(args)))
+
+    def _world_setBlock(self, args):
+        self._blockArgs(args, ())
+
+    def _world_setBlocks(self, args):
+        x0, y0, z0, x1, y1, z1 = self._ints(args, 6)
+        material = args[6]
+        for y in range(min(y0, y1), max(y0, y1) + 1):
+            for x in range(min(x0, x1), max(x0, x1) + 1):
+                for z in range(min(z0, z1), max(z0, z1) + 1):
+                    self.world.set(x, y, z, material)
+
+    def _world_setBlockDir(self, args):
+        self._blockArgs(args, ("facing",))
+
+    def _world_setBlockMultiFace(self, args):
+        x, y, z = self._ints(args)
+        self.world.set(x, y, z, args[3], [(f.lower(), "true") for f in args[4:] if f])
+
+    _world_setPane = _world_setBlockMultiFace
+
+    def _world_setBlockOrient(self, args):
+        self._blockArgs(args, ("axis",))
+
+    def _world_setBlockRotat(self, args):
+        self._blockArgs(args, ("rotation",))
+
+    def _world_setBlockAge(self, args):
+        self._blockArgs(args, ("age",))
+
+    def _world_setBlockBisected(self, args):
+        self._blockArgs(args, ("half",))
+
+    def _world_setBlockSapl(self, args):
+        self._blockArgs(args, ("stage",))
+
+    def _world_setBlockLevel(self, args):
+        self._blockArgs(args, ("level",))
+
+    def _world_setSign(self, args):
+        self._blockArgs(args[:5], ("rotation" if "WALL" not in args[3].upper() else "facing",))
+        self.world.signs[tuple(self._ints(args))] = args[5:9]
+
+    def _world_setBed(self, args):
+        self._blockArgs(args, ("part", "facing"))
+
+    def _world_setGate(self, args):
+        self._blockArgs(args, ("facing", "in_wall"))
+
+    def _world_setDoor(self, args):
+        self._blockArgs(args, ("facing", "hinge", "half"))
+
+    def _world_setTrapDoor(self, args):
+        self._blockArgs(args, ("facing", "half", "open"))
+
+    def _world_setFence(self, args):
+        x, y, z = self._ints(args)
+        self.world.set(x, y, z, args[3], [(args[4].lower(), "true")] if len(args) > 4 else [])
+
+    def _world_setChest(self, args):
+        self._blockArgs(args, ("type", "facing"))
+
+    def _world_setFurnace(self, args):
+        self._blockArgs(args, ("facing", "lit"))
+
+    def _world_setSlab(self, args):
+        self._blockArgs(args, ("type",))
+
+    def _world_setStairs(self, args):
+        self._blockArgs(args, ("facing", "shape", "half"))
+
+    def _world_getHeight(self, args):
+        x, z = self._ints(args, 2)
+        return self.world.height(x, z)
+
+    def _world_getPlayerIds(self, args):
+        if not self.players:
+            raise LookupError("no players online")
+        return "|".join(str(p.id) for p in self.players)
+
+    def _world_getPlayerId(self, args):
+        player = self.player(args[0])
+        if player is None:
+            raise LookupError("no player " + args[0])
+        return player.id
+
+    def _world_checkpoint_save(self, args):
+        self._checkpoint = copy.deepcopy(self.world)
+
+    def _world_checkpoint_restore(self, args):
+        if self._checkpoint is not None:
+            self.world = copy.deepcopy(self._checkpoint)
+
+    def _world_setting(self, args):
+        self.settings[args[0]] = args[1] == "1"
+
+    def _world_getEntityTypes(self, args):
+        return ",".join(EntityTypes)
+
+    def _listEntities(self, entities, typeId):
+        return "".join("%d,%s,%s,%s,%s|"%(e.id, e.type, e.x, e.y, e.z) for e in entities
+                       if not typeId or e.type == typeId.upper())
+
+    def _world_getEntities(self, args):
+        typeId = args[0] if args else ""
+        return self._listEntities([e for e in self.entities.values() if e.type != "PLAYER"], typeId)
+
+    def _world_removeEntity(self, args):
+        entity = self.entities.get(int(args[0]))
+        if entity is None or entity.type == "PLAYER":
+            return 0
+        del self.entities[entity.id]
+        return 1
+
+    def _world_removeEntities(self, args):
+        typeId = args[0].upper() if args else ""
+        doomed = [e.id for e in self.entities.values() if e.type != "PLAYER" and (not typeId or e.type == typeId)]
+        for id in doomed:
+            del self.entities[id]
+        return len(doomed)
+
+    def _world_setEntityName(self, args):
+        self.entities[int(args[0])].name = ",".join(args[1:])
+        return True
+
+    def _spawn(self, type, args):
+        x, y, z = (float(a) for a in args[:3])
+        entity = self.addEntity(type, x, y, z)
+        if "BABY" in args[3:]:
+            entity.age = -24000
+        return entity.id
+
+    def _world_spawnEntity(self, args):
+        return self._spawn(args[3], args)
+
+    def _world_spawnCat(self, args):
+        return self._spawn("CAT", args)
+
+    def _world_spawnHorse(self, args):
+        return self._spawn("HORSE", args)
+
+    def _world_spawnParrot(self, args):
+        return self._spawn("PARROT", args)
+
+    def _world_spawnRabbit(self, args):
+        return self._spawn("RABBIT", args)
+
+    def _world_spawnWolf(self, args):
+        return self._spawn("WOLF", args)
+
+    def _chat_post(self, args):
+        self.chatLog.append(",".join(args))
+
+    # -------------------------------------- EVENTS --------------------------------------
+
+    @staticmethod
+    def _take(queue, keep):
+        taken = [e for e in queue if not keep(e)]
+        queue[:] = [e for e in queue if keep(e)]
+        return taken
+
+    def _events_clear(self, args):
+        del self.blockHits[:]
+        del self.chatPosts[:]
+        del self.projectileHits[:]
+
+    def _events_block_hits(self, args):
+        hits = self._take(self.blockHits, lambda e: False)
+        return "|".join("%d,%d,%d,%d,%d"%h for h in hits)
+
+    def _events_chat_posts(self, args):
+        posts = self._take(self.chatPosts, lambda e: False)
+        return "|".join("%d,%s"%p for p in posts)
+
+    def _events_projectile_hits(self, args):
+        hits = self._take(self.projectileHits, lambda e: False)
+        return "|".join("%d,%d,%d,%s,%d,%s"%h for h in hits)
+
+    def _entity_events_clear(self, entity, args):
+        self.blockHits[:] = [e for e in self.blockHits if e[4] != entity.id]
+        self.chatPosts[:] = [e for e in self.chatPosts if e[0] != entity.id]
+        self.projectileHits[:] = [e for e in self.projectileHits if e[3] != entity.name]
+
+    def _entity_events_block_hits(self, entity, args):
+        hits = self._take(self.blockHits, lambda e: e[4] != entity.id)
+        return "|".join("%d,%d,%d,%d,%d"%h for h in hits)
+
+    def _entity_events_chat_posts(self, entity, args):
+        posts = self._take(self.chatPosts, lambda e: e[0] != entity.id)
+        return "|".join("%d,%s"%p for p in posts)
+
+    def _entity_events_projectile_hits(self, entity, args):
+        hits = self._take(self.projectileHits, lambda e: e[3] != entity.name)
+        return "|".join("%d,%d,%d,%s,%d,%s"%h for h in hits)
+
+    # -------------------------------------- ENTITY / PLAYER --------------------------------------
+
+    def _entity_getType(self, entity, args):
+        return entity.type
+
+    def _entity_getPos(self, entity, args):
+        return "%s,%s,%s"%(entity.x, entity.y, entity.z)
+
+    def _entity_setPos(self, entity, args):
+        entity.x, entity.y, entity.z = (float(a) for a in args[:3])
+
+    def _entity_getTile(self, entity, args):
+        return "%d,%d,%d"%(math.floor(entity.x), math.floor(entity.y), math.floor(entity.z))
+
+    def _entity_setTile(self, entity, args):
+        entity.x, entity.y, entity.z = (float(a) for a in args[:3])
+
+    def _entity_getDirection(self, entity, args):
+        yaw = math.radians(entity.yaw)
+        pitch = math.radians(entity.pitch)
+        return "%s,%s,%s"%(-math.sin(yaw) * math.cos(pitch), -math.sin(pitch), math.cos(yaw) * math.cos(pitch))
+
+    def _entity_setDirection(self, entity, args):
+        x, y, z = (float(a) for a in args[:3])
+        entity.yaw = math.degrees(math.atan2(-x, z)) % 360
+        entity.pitch = math.degrees(-math.asin(max(-1.0, min(1.0, y / (math.sqrt(x * x + y * y + z * z) or 1)))))
+
+    def _entity_getRotation(self, entity, args):
+        return entity.yaw
+
+    def _entity_setRotation(self, entity, args):
+        entity.yaw = float(args[0])
+
+    def _entity_getPitch(self, entity, args):
+        return entity.pitch
+
+    def _entity_setPitch(self, entity, args):
+        entity.pitch = float(args[0])
+
+    def _entity_setting(self, entity, args):
+        entity.attributes["setting." + args[0]] = args[1] == "1"
+
+    def _nearby(self, entity, args):
+        distance = float(args[0]) if args and args[0] else 10.0
+        typeId = args[1].upper() if len(args) > 1 else ""
+        return [e for e in self.entities.values()
+                if e is not entity and e.distanceTo(entity) <= distance and (not typeId or e.type == typeId)]
+
+    def _entity_getEntities(self, entity, args):
+        return self._listEntities(self._nearby(entity, args), "")
+
+    def _entity_removeEntities(self, entity, args):
+        doomed = [e.id for e in self._nearby(entity, args) if e.type != "PLAYER"]
+        for id in doomed:
+            del self.entities[id]
+        return len(doomed)
+
+    def _entity_getName(self, entity, args):
+        return entity.name or entity.type.title()
+
+    def _entity_getAge(self, entity, args):
+        return entity.age
+
+    def _entity_setAge(self, entity, args):
+        entity.age = int(args[0])
+        return True
+
+    def _entity_getAgeLock(self, entity, args):
+        return entity.ageLock
+
+    def _entity_setAgeLock(self, entity, args):
+        entity.ageLock = _bool(args[0])
+        return True
+
+    def _entity_setBaby(self, entity, args):
+        entity.age = -24000
+        return True
+
+    def _entity_setAdult(self, entity, args):
+        entity.age = 0
+        return True
+
+    def _entity_isAdult(self, entity, args):
+        return entity.age >= 0
+
+    def _entity_isTamed(self, entity, args):
+        return entity.tamed
+
+    def _entity_setTamed(self, entity, args):
+        entity.tamed = _bool(args[0])
+        return True
+
+    def _entity_getOwner(self, entity, args):
+        return "" if entity.owner is None else entity.owner
+
+    def _entity_setOwner(self, entity, args):
+        entity.owner = int(args[0])
+        entity.tamed = True
+        return True
+
+    def _entity_getDomestication(self, entity, args):
+        return entity.domestication
+
+    def _entity_setDomestication(self, entity, args):
+        entity.domestication = int(args[0])
+        return True
+
+    def _entity_getMaxDomestication(self, entity, args):
+        return entity.maxDomestication
+
+    def _entity_setMaxDomestication(self, entity, args):
+        entity.maxDomestication = int(args[0])
+        return True
+
+    def _entity_getJumpStrength(self, entity, args):
+        return entity.jumpStrength
+
+    def _entity_setJumpStrength(self, entity, args):
+        entity.jumpStrength = float(args[0])
+        return True
+
+    def _entity_callMethod(self, entity, args):
+        method, values = args[0], args[1:]
+        for prefix in ("set", "get", "is", "has"):
+            if method.startswith(prefix):
+                key = method[len(prefix):]
+                break
+        else:
+            raise AttributeError(method)
+        if prefix == "set":
+            entity.attributes[key] = ",".join(values)
+            return True
+        return entity.attributes.get(key, "null")
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "In-memory stand-in for a Minecraft server with MCPythonMod")
+    parser.add_argument("--address", default = "localhost")
+    parser.add_argument("--port", type = int, default = 4711)
+    parser.add_argument("--player", action = "append", dest = "players", help = "online player (repeatable)")
+    args = parser.parse_args(argv)
+    server = StandInServer(args.address, args.port, args.players or ("steve",)).start()
+    sys.stderr.write("stand-in server listening on %s:%d\n"%(args.address, server.port))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
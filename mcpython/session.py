@@ -0,0 +1,258 @@
+import collections
+import math
+from .pipeline import bind
+from .util import flatten
+
+""" Edit sessions: world writes held back and sent as one minimal batch
+
+    Minecraft.editSession() returns an EditSession.  Methods called through it run
+    against a _RecordingConnection that keeps every world.set* command (setBlock,
+    setBlocks, setStairs, setDoor, ...) instead of sending it; everything else, reads
+    included, goes to the server straight away, so reads do not see the writes held
+    back.  On commit the recorded writes are reduced and sent in a single write:
+
+    - a block written several times only gets its last write
+    - plain setBlock and setBlocks writes are merged into as few cuboids as possible
+    - other setters are sent in the order they were made; plain writes made before
+      them close by (they may place more than one block, e.g. doors and beds) are
+      sent before them, those made after them are sent after them
+    - if that comes to more commands than were recorded (merging can split a shape
+      into many cuboids), the recorded commands are sent instead, minus those whose
+      blocks are all overwritten later
+
+        with mc.editSession() as s:
+            s.setBlocks(0, 0, 0, 9, 9, 9, "STONE")
+            s.setBlocks(1, 1, 1, 8, 8, 8, "AIR")
+            s.setDoor(5, 1, 0, "OAK_DOOR", "NORTH", "LEFT")
+        print(s.recorded, s.sent)
+"""
+
+class _RecordingConnection:
+    """Connection stand-in of an EditSession: world writes are recorded, the rest is sent"""
+    def __init__(self, session, conn):
+        self._session = session
+        self._conn = conn
+
+    def send(self, f, *data):
+        if f.startswith(b"world.set") and f != b"world.setting":
+            self._session._record(f, data)
+        else:
+            self._conn.send(f, *data)
+
+    def sendMany(self, f, argsList):
+        self.sendCommands([(f, data) for data in argsList])
+
+    def sendCommands(self, commands):
+        passed = []
+        for f, data in commands:
+            if f.startswith(b"world.set") and f != b"world.setting":
+                self._session._record(f, data)
+            else:
+                passed.append((f, data))
+        if passed:
+            self._conn.sendCommands(passed)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+def _merge(cells):
+    """
+    Covers {(x, y, z): material} with cuboids of one material each: runs along z,
+    then runs of equal runs along x, then along y
+
+    :return: the world.setBlock and world.setBlocks commands writing cells
+    :rtype: [(f, data)]
+    """
+    byMaterial = collections.defaultdict(list)
+    for (x, y, z), material in cells.items():
+        byMaterial[material].append((y, x, z))
+    commands = []
+    for material, positions in byMaterial.items():
+        positions.sort()
+        runs = []
+        for y, x, z in positions:
+            if runs and runs[-1][0] == y and runs[-1][1] == x and runs[-1][3] == z - 1:
+                runs[-1][3] = z
+            else:
+                runs.append([y, x, z, z])
+        rects = []
+        growing = {}
+        for y, x, z0, z1 in runs:
+            rect = growing.get((y, z0, z1))
+            if rect is not None and rect[1] == x - 1:
+                rect[1] = x
+            else:
+                rect = growing[(y, z0, z1)] = [x, x, y, z0, z1]
+                rects.append(rect)
+        rects.sort(key = lambda r: r[2])
+        boxes = []
+        growing = {}
+        for x0, x1, y, z0, z1 in rects:
+            box = growing.get((x0, x1, z0, z1))
+            if box is not None and box[4] == y - 1:
+                box[4] = y
+            else:
+                box = growing[(x0, x1, z0, z1)] = [x0, y, z0, x1, y, z1]
+                boxes.append(box)
+        for x0, y0, z0, x1, y1, z1 in boxes:
+            if x0 == x1 and y0 == y1 and z0 == z1:
+                commands.append((b"world.setBlock", (x0, y0, z0, material)))
+            else:
+                commands.append((b"world.setBlocks", (x0, y0, z0, x1, y1, z1, material)))
+    return commands
+
+class EditSession:
+    """
+    Proxy for a Minecraft object whose world writes are held back until :func:`commit`.
+    Use it as a context manager: the writes are committed when the block ends, or
+    discarded if it ends with an exception.
+
+    :param target: the Minecraft object to edit through
+    :type target: mcpython.minecraft.Minecraft
+    """
+    ExpandLimit = 32768
+    Margin = 1
+
+    def __init__(self, target):
+        self.target = target
+        self.recorded = 0
+        self.sent = 0
+        self._bound = bind(target, _RecordingConnection(self, target.conn))
+        self._reset()
+
+    def _reset(self):
+        self._log = []
+        self._origin = {}
+        self._cells = {}
+        self._ops = []
+        self._batched = {}
+
+    def __getattr__(self, name):
+        return getattr(self._bound, name)
+
+    # -------------------------------------- RECORDING --------------------------------------
+
+    def _record(self, f, data):
+        self.recorded += 1
+        index = len(self._log)
+        self._log.append((f, data, False))
+        n = 3 if f == b"world.setBlock" else 6 if f == b"world.setBlocks" else 0
+        values = []
+        for v in flatten(data):
+            if type(v) is float:
+                v = math.floor(v)
+            values.append(v)
+        coords = values[:n or 3]
+        if len(coords) < (n or 3) or any(type(v) is not int for v in coords):
+            # nowhere to put it: keep it in order after everything recorded so far
+            self._close(None)
+            self._ops.append((f, data))
+            self._log[index] = (f, data, True)
+            return
+        plain = n and len(values) == n + 1 and isinstance(values[n], str)
+        if n == 3 and plain:
+            self._write(tuple(coords), values[3], index)
+            return
+        if n == 6 and plain:
+            x0, y0, z0, x1, y1, z1 = coords
+            x0, x1 = min(x0, x1), max(x0, x1)
+            y0, y1 = min(y0, y1), max(y0, y1)
+            z0, z1 = min(z0, z1), max(z0, z1)
+            if (x1 - x0 + 1) * (y1 - y0 + 1) * (z1 - z0 + 1) <= EditSession.ExpandLimit:
+                material = values[6]
+                for y in range(y0, y1 + 1):
+                    for x in range(x0, x1 + 1):
+                        for z in range(z0, z1 + 1):
+                            self._write((x, y, z), material, index)
+                return
+            # too large to expand: overwrites what was written inside, stays in order
+            box = (x0, y0, z0, x1, y1, z1)
+            for pos in self._positions(box, self._cells) + self._positions(box, self._batched):
+                self._forget(pos)
+            self._ops.append((f, data))
+            self._log[index] = (f, data, True)
+            return
+        # a setter with block data, or setBlock/setBlocks with extra arguments
+        x, y, z = coords
+        self._forget((x, y, z))
+        m = EditSession.Margin
+        self._close((x - m, y - m, z - m, x + m, y + m, z + m))
+        self._ops.append((f, data))
+        self._log[index] = (f, data, True)
+
+    def _write(self, pos, material, index):
+        self._forget(pos)
+        self._cells[pos] = material
+        self._origin[pos] = index
+
+    def _forget(self, pos):
+        """Drops the plain writes recorded so far for pos, they would be overwritten"""
+        self._cells.pop(pos, None)
+        self._origin.pop(pos, None)
+        batch = self._batched.pop(pos, None)
+        if batch is not None:
+            del batch[pos]
+
+    def _positions(self, box, cells):
+        """The positions of cells within box"""
+        x0, y0, z0, x1, y1, z1 = box
+        if (x1 - x0 + 1) * (y1 - y0 + 1) * (z1 - z0 + 1) <= len(cells):
+            return [(x, y, z) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)
+                    for z in range(z0, z1 + 1) if (x, y, z) in cells]
+        return [pos for pos in cells if x0 <= pos[0] <= x1 and y0 <= pos[1] <= y1 and z0 <= pos[2] <= z1]
+
+    def _close(self, box):
+        """Moves the pending plain writes within box (all of them for None) into the
+        ordered commands, so they are sent before whatever is recorded next"""
+        if box is None:
+            batch, self._cells = self._cells, {}
+        else:
+            batch = {}
+            for pos in self._positions(box, self._cells):
+                batch[pos] = self._cells.pop(pos)
+        if batch:
+            for pos in batch:
+                self._batched[pos] = batch
+            self._ops.append(batch)
+
+    # -------------------------------------- COMMIT --------------------------------------
+
+    def commands(self):
+        """The commands a commit would send now => [(f, data)]. That is the merged
+        stream, or the recorded commands minus those completely overwritten later when
+        that is shorter, e.g. for a hollow box drawn as a filled one and its inside"""
+        merged = []
+        for op in self._ops:
+            if type(op) is dict:
+                merged.extend(_merge(op))
+            else:
+                merged.append(op)
+        merged.extend(_merge(self._cells))
+        live = set(self._origin.values())
+        recorded = [(f, data) for i, (f, data, kept) in enumerate(self._log) if kept or i in live]
+        return recorded if len(recorded) < len(merged) else merged
+
+    def commit(self):
+        """Sends the recorded writes as a minimal batch, in a single write => number of commands sent"""
+        commands = self.commands()
+        self._reset()
+        self.sent += len(commands)
+        self.target.conn.sendCommands(commands)
+        return len(commands)
+
+    def discard(self):
+        """Forgets the recorded writes"""
+        self._reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc, value, traceback):
+        if exc is None:
+            self.commit()
+        else:
+            self.discard()
+        return False
+
+    def __repr__(self):
+        return "EditSession(recorded=%d, sent=%d)"%(self.recorded, self.sent)
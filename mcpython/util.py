@@ -1,19 +1,201 @@
-import collections
+import array
+import collections.abc
+import struct
+import sys
+import textwrap
+from .vec3 import Vec3
+from .block import Block
+from .entity import Entity
 
 def flatten(l):
     for e in l:
-        if isinstance(e, collections.Iterable) and not isinstance(e, str):
+        t = type(e)
+        if t is int or t is float or t is str: yield e
+        elif isinstance(e, collections.abc.Iterable) and not isinstance(e, str):
             for ee in flatten(e): yield ee
         else: yield e
 
 def flatten_parameters_to_bytestring(l):
-    return b",".join(map(_misc_to_bytes, flatten(l)))
+    out = []
+    _encode_into(out, l)
+    return b",".join(out)
+
+# Characters that would end an argument or the whole command, mapped to look-alikes
+_text_table = str.maketrans({",": ";", "(": "[", ")": "]", "\n": " ", "\r": " "})
+# Line breaks end the whole command
+_line_table = str.maketrans({"\n": " ", "\r": " "})
+
+def escape_text(s):
+    """
+    Makes sign lines safe to send as one of several text arguments: commas become ;, 
+    parentheses become [ and ], line breaks become spaces.
+    """
+    return str(s).translate(_text_table)
+
+def escape_line(s):
+    """
+    Makes free text sent as the last argument (chat messages, entity names) safe: line 
+    breaks become spaces.  Commas and parentheses reach the server as they are.
+    """
+    return str(s).translate(_line_table)
+
+def chat_lines(msg, width = 256):
+    """
+    Splits a message, or a list of messages, into chat lines: one per line of text, 
+    long lines wrapped at width characters.
+    """
+    if isinstance(msg, (list, tuple)):
+        msg = "\n".join(str(m) for m in msg)
+    lines = []
+    for line in str(msg).splitlines() or [""]:
+        if len(line) <= width:
+            lines.append(line)
+        else:
+            lines.extend(textwrap.wrap(line, width))
+    return lines
+
+def pack_block_palette(names):
+    """
+    Palette-encodes a sequence of block names for a binary block transfer:
+    palette size (uint16), then each palette entry as a length (uint8) and UTF-8
+    name, then the block count (uint32) and one index per block, uint8 while the
+    palette has at most 256 entries and uint16 otherwise.  Little endian throughout.
+    """
+    palette = {}
+    indices = [palette.setdefault(name, len(palette)) for name in names]
+    out = [struct.pack("<H", len(palette))]
+    for name in palette:
+        encoded = name.encode("UTF-8")
+        out.append(struct.pack("<B", len(encoded)))
+        out.append(encoded)
+    out.append(struct.pack("<I", len(indices)))
+    wide = array.array("B" if len(palette) <= 256 else "H", indices)
+    if wide.itemsize > 1 and sys.byteorder != "little":
+        wide.byteswap()
+    out.append(wide.tobytes())
+    return b"".join(out)
+
+def unpack_block_palette(payload):
+    """
+    Decodes :func:`pack_block_palette` output
+
+    :return: (palette, indices): the block names and, per block, its palette index
+    :rtype: (list, array.array)
+    """
+    (n,) = struct.unpack_from("<H", payload, 0)
+    offset = 2
+    palette = []
+    for _ in range(n):
+        length = payload[offset]
+        palette.append(payload[offset + 1:offset + 1 + length].decode("UTF-8"))
+        offset += 1 + length
+    (count,) = struct.unpack_from("<I", payload, offset)
+    offset += 4
+    indices = array.array("B" if n <= 256 else "H")
+    indices.frombytes(payload[offset:offset + count * indices.itemsize])
+    if indices.itemsize > 1 and sys.byteorder != "little":
+        indices.byteswap()
+    return palette, indices
+
+def require_numpy(feature):
+    """Returns the numpy module, or raises ImportError naming the feature that needs it"""
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("%s needs numpy, install it with: pip install numpy"%feature)
+    return numpy
+
+def blocks_array(reply, shape, palette):
+    """
+    Decodes a world.getBlocks (text) or world.getBlocksBinary reply into block codes
+
+    :param reply: the reply
+    :type reply: str, bytes
+    :param shape: (ny, nx, nz) of the cuboid, the order the server lists blocks in
+    :type shape: tuple
+    :param palette: material name -> code, extended with any new names
+    :type palette: dict
+
+    :return: codes into palette
+    :rtype: numpy.ndarray of uint16 with the given shape
+    """
+    numpy = require_numpy("blocks_array")
+    if isinstance(reply, bytes):
+        names, indices = unpack_block_palette(reply)
+        lookup = numpy.array([palette.setdefault(name, len(palette)) for name in names], dtype = numpy.uint16)
+        codes = lookup[numpy.frombuffer(indices, dtype = numpy.uint8 if indices.itemsize == 1 else numpy.uint16)]
+    else:
+        names = reply.split(",")
+        for name in dict.fromkeys(names):
+            palette.setdefault(name, len(palette))
+        codes = numpy.fromiter(map(palette.__getitem__, names), dtype = numpy.uint16, count = len(names))
+    return codes.reshape(shape)
 
 def _misc_to_bytes(m):
     """
-    Convert an arbitrary object into a string encoded as a UTF-8 series of bytes. 
+    Convert an arbitrary object into a string encoded as a UTF-8 series of bytes.
 
     See `Connection.send` for more details.
     """
 
     return str(m).encode("UTF-8")
+
+# Encoders for the argument types that make up nearly every command, dispatched on
+# the exact type so the common cases skip flatten's isinstance checks and generators.
+# int, str, float, tuple and list are tested inline in _encode_into, the rest go
+# through _encoders.  Each one appends the encoded scalars of its argument to out.
+
+def _encode_str(out, s):
+    out.append(s.encode("UTF-8"))
+
+def _encode_int(out, i):
+    out.append(b"%d"%i)
+
+def _encode_float(out, f):
+    out.append(b"%r"%f)
+
+def _encode_vec3(out, v):
+    _encode_into(out, (v.x, v.y, v.z))
+
+def _encode_block(out, b):
+    _encode_into(out, (b.id, b.data))
+
+def _encode_entity(out, e):
+    _encode_into(out, (e.id,))
+
+def _encode_into(out, l):
+    """Appends the encoded scalars of the (nested) sequence l to out"""
+    append = out.append
+    for e in l:
+        t = type(e)
+        if t is int:
+            append(b"%d"%e)
+        elif t is str:
+            append(e.encode("UTF-8"))
+        elif t is float:
+            append(b"%r"%e)
+        elif t is tuple or t is list:
+            _encode_into(out, e)
+        else:
+            encoder = _encoders.get(t)
+            if encoder is None:
+                _encode_other(out, e)
+            else:
+                encoder(out, e)
+
+def _encode_other(out, e):
+    if isinstance(e, collections.abc.Iterable) and not isinstance(e, str):
+        _encode_into(out, e)
+    else:
+        out.append(_misc_to_bytes(e))
+
+_encoders = {
+    str: _encode_str,
+    int: _encode_int,
+    float: _encode_float,
+    tuple: _encode_into,
+    list: _encode_into,
+    Vec3: _encode_vec3,
+    Block: _encode_block,
+    Entity: _encode_entity,
+}
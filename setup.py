@@ -36,4 +36,5 @@ setup(name='mcpython',
       license= __license__,
       packages = find_packages(),
 #      install_requires = __requires__,
+      extras_require = {"numpy": ["numpy"]},
       zip_safe=False)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import os
+import random
+import tempfile
+
+from mcpython.connection import BinaryReply, Connection, LineReader, RequestTimeout, binaryFrame
+from mcpython.minecraft import Minecraft
+from mcpython.record import Binary, Recorder, Reply, readRecording, replay
+from mcpython.server import StandInServer
+
+# Runs offline against the in-memory stand-in server: binary frames mixed with text
+# replies, binary getBlocks transfers and recording / replaying them.
+
+verbose = True
+random.seed(2)
+
+if verbose:
+    print()
+    print("FRAMING")
+    print()
+
+replies = []
+for _ in range(200):
+    if random.random() < 0.3:
+        replies.append(BinaryReply(bytes(random.randint(0, 255) for _ in range(random.randint(0, 40)))))
+    else:
+        replies.append("".join(random.choice("ab,|") for _ in range(random.randint(0, 40))))
+stream = b"".join(binaryFrame(r) if type(r) is BinaryReply else r.encode() + b"\n" for r in replies)
+reader = LineReader(None)
+i = 0
+while i < len(stream):
+    n = random.randint(1, 30)
+    reader.feed(stream[i:i + n])
+    i += n
+framed = [reader.pop() for _ in range(len(reader))]
+if framed != replies or [type(r) for r in framed] != [type(r) for r in replies]:
+    print("***** ERROR: replies fed in random pieces were framed differently")
+elif verbose:
+    print("framed " + str(len(framed)) + " text and binary replies fed in random pieces")
+
+if verbose:
+    print()
+    print("BINARY GETBLOCKS")
+    print()
+
+def world(capabilities):
+    server = StandInServer(port = 0, capabilities = capabilities).start()
+    mc = Minecraft.create("localhost", port = server.port, timeout = 5.0)
+    mc.setBlocks(0, 0, 0, 5, 5, 5, "STONE")
+    mc.setBlocks(1, 1, 1, 4, 4, 4, "GLASS")
+    mc.setBlock(2, 2, 2, "GOLD_BLOCK")
+    return server, mc
+
+server, mc = world(())
+text = list(mc.getBlocks(0, 0, 0, 5, 5, 5))
+mc.conn.close()
+server.stop()
+server, mc = world(None)
+binary = list(mc.getBlocks(0, 0, 0, 5, 5, 5))
+if binary != text:
+    print("***** ERROR: binary and text getBlocks differ")
+elif verbose:
+    print("binary and text getBlocks agree on " + str(len(binary)) + " blocks")
+
+if verbose:
+    print()
+    print("RECORDING")
+    print()
+
+path = os.path.join(tempfile.mkdtemp(), "binary.mcrec")
+try:
+    with Recorder(mc.conn, path) as recorder:
+        mc.setBlock(3, 3, 3, "DIRT")
+        recorded = list(mc.getBlocks(0, 0, 0, 5, 5, 5))
+        block = mc.getBlock(3, 3, 3)
+except RequestTimeout:
+    print("***** ERROR: a request timed out while recording binary replies")
+else:
+    kinds = [kind for kind, t, data in readRecording(path) if kind != 0]
+    if block != "DIRT" or recorded[:3] != ["STONE"] * 3:
+        print("***** ERROR: wrong replies while recording: " + block + " " + str(recorded[:3]))
+    elif kinds != [Binary, Reply]:
+        print("***** ERROR: expected a binary and a text reply record, got " + str(kinds))
+    elif verbose:
+        print("recorded " + str(recorder.sent) + " commands and " + str(recorder.replies) + " replies")
+    replayServer, replayMc = world(None)
+    replayMc.conn.close()
+    result = replay(path, "localhost", replayServer.port, timeout = 5.0)
+    if result.replies != result.expected or result.mismatches:
+        print("***** ERROR: replay did not match the recording: " + str(result))
+    elif verbose:
+        print("replayed: " + str(result))
+    replayServer.stop()
+mc.conn.close()
+server.stop()
+
+if verbose:
+    print()
+    print("SILENT CAPABILITY PROBE")
+    print()
+
+class SilentServer(StandInServer):
+    """Never answers the capability probe, like servers that ignore unknown commands"""
+    def handle(self, line):
+        if line.startswith(Connection.CapabilitiesCommand.decode()):
+            return None
+        return StandInServer.handle(self, line)
+
+Connection.CapabilityTimeout = 0.2
+server = SilentServer(port = 0).start()
+for timeout in (None, 5.0):
+    mc = Minecraft.create("localhost", port = server.port, timeout = timeout)
+    mc.setBlocks(0, 0, 0, 2, 2, 2, "STONE")
+    try:
+        blocks = list(mc.getBlocks(0, 0, 0, 2, 0, 0))
+        block = mc.getBlock(1, 1, 1)
+        p = mc.pipeline()
+        calls = [p.getBlock(x, 5, 0) for x in range(3)] + [p.getBlock(1, 1, 1)]
+        replies = [c.result() for c in calls]
+    except RequestTimeout:
+        print("***** ERROR: timeout=" + str(timeout) + ": requests after the silent probe timed out")
+        continue
+    if blocks != ["STONE"] * 3 or block != "STONE" or replies != ["AIR"] * 3 + ["STONE"]:
+        print("***** ERROR: timeout=" + str(timeout) + ": replies out of step after the silent probe: "
+              + str(blocks) + " " + block + " " + str(replies))
+    elif mc.conn.capabilities():
+        print("***** ERROR: a silent server was taken to support " + str(mc.conn.capabilities()))
+    elif verbose:
+        print("timeout=" + str(timeout) + ": fell back to text getBlocks, replies stayed in step")
+    mc.conn.close()
+server.stop()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import threading
+
+from mcpython.minecraft import Minecraft
+from mcpython.minecraft import CmdPlayer
+from mcpython.server import StandInServer
+
+# Several threads share one connection; every reply must reach the thread that asked.
+
+verbose = True
+calls = 2000
+
+server = StandInServer(port = 0).start()
+mc = Minecraft.create("localhost", port = server.port)
+
+materials = ["STONE", "DIRT", "SAND", "GLASS", "OAK_LOG", "GOLD_BLOCK", "IRON_BLOCK", "BRICKS"]
+for x, material in enumerate(materials):
+    mc.setBlock(x, 10, 0, material)
+
+errors = []
+
+def builder(x):
+    for _ in range(calls):
+        material = mc.getBlock(x, 10, 0)
+        if material != materials[x]:
+            errors.append("thread " + str(x) + " expected " + materials[x] + " but got " + material)
+
+def poller():
+    player = CmdPlayer(mc.conn)
+    for _ in range(calls):
+        events = player.pollChatPosts()
+        if not isinstance(events, list):
+            errors.append("poller got " + str(events))
+
+threads = [threading.Thread(target = builder, args = (x,)) for x in range(len(materials))]
+threads.append(threading.Thread(target = poller))
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+
+for error in errors[:10]:
+    print("***** ERROR: " + error)
+if verbose:
+    print(str(len(threads)) + " threads made " + str(len(threads) * calls) + " calls, " + str(len(errors)) + " errors")
+
+mc.conn.close()
+server.stop()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import random
+
+from mcpython.minecraft import Minecraft
+from mcpython.server import StandInServer
+
+# The same random edits, sent directly and through an edit session (with and without
+# the write filter), must leave the same world behind.
+
+verbose = True
+random.seed(1)
+materials = ["STONE", "DIRT", "AIR", "GLASS"]
+edits = []
+for _ in range(500):
+    p = tuple(random.randint(0, 6) for _ in range(3))
+    r = random.random()
+    if r < 0.6:
+        edits.append(("setBlock", p + (random.choice(materials),)))
+    elif r < 0.8:
+        edits.append(("setBlocks", p + tuple(random.randint(0, 6) for _ in range(3)) + (random.choice(materials),)))
+    elif r < 0.9:
+        edits.append(("setStairs", p + ("OAK_STAIRS", "EAST", "STRAIGHT", "BOTTOM")))
+    else:
+        edits.append(("setDoor", p + ("OAK_DOOR", "NORTH", "LEFT")))
+
+def build(session, filtered):
+    server = StandInServer(port = 0).start()
+    mc = Minecraft.create("localhost", port = server.port)
+    if filtered:
+        mc.filterWrites()
+    if session:
+        with mc.editSession() as s:
+            for name, args in edits:
+                getattr(s, name)(*args)
+    else:
+        for name, args in edits:
+            getattr(mc, name)(*args)
+    mc.getPlayerEntityIds()
+    commands = server.commands
+    world = [mc.getBlockWithData(x, y, z) for x in range(8) for y in range(8) for z in range(8)]
+    mc.conn.close()
+    server.stop()
+    return world, commands
+
+direct, sent = build(False, False)
+for session, filtered in ((True, False), (False, True), (True, True)):
+    world, commands = build(session, filtered)
+    if world != direct:
+        print("***** ERROR: session=" + str(session) + " filtered=" + str(filtered) + " built a different world")
+    elif verbose:
+        print("session=" + str(session) + " filtered=" + str(filtered) + ": " + str(commands) + " commands instead of " + str(sent))
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import warnings
+
+from mcpython.entity import EntityColumns, EntityRecord
+from mcpython.event import BlockEvent
+from mcpython.minecraft import CmdEvents, Minecraft
+from mcpython.server import StandInServer
+
+# Runs offline: event and entity replies, well formed and malformed, parsed into
+# lists and into numpy arrays must agree, and malformed entries must never be
+# merged into made-up events.
+
+verbose = True
+
+def parse(s):
+    with warnings.catch_warnings(record = True) as caught:
+        warnings.simplefilter("always")
+        events = [(e.x, e.y, e.z, e.face, e.entityId) for e in BlockEvent.parseHits(s)]
+        array = [tuple(int(v) for v in hit) for hit in BlockEvent.hitsArray(s)]
+    return events, array, len(caught)
+
+for s, expected, warned in (
+        ("1,2,3,4,5|6,7,8,9,10", [(1, 2, 3, 4, 5), (6, 7, 8, 9, 10)], 0),
+        ("", [], 0),
+        ("1,2,3,4,5||6,7,8,9,10|", [(1, 2, 3, 4, 5), (6, 7, 8, 9, 10)], 0),
+        ("1,2,3,4|5,6,7,8,9,10", [], 2),
+        ("1,2,3,4,5|6,7,x,9,10", [(1, 2, 3, 4, 5)], 1)):
+    events, array, warnings_ = parse(s)
+    if events != expected or array != expected:
+        print("***** ERROR: " + repr(s) + " parsed as " + str(events) + " and " + str(array))
+    elif bool(warnings_) != bool(warned):
+        print("***** ERROR: " + repr(s) + " gave " + str(warnings_) + " warnings")
+    elif verbose:
+        print(repr(s) + " => " + str(array))
+
+try:
+    EntityColumns.parse("1,COW,1,2|3,2,PIG,4,5,6")
+    print("***** ERROR: a misaligned entity list was accepted")
+except ValueError:
+    pass
+columns = EntityColumns.parse("1,COW,1,2,3||2,PIG,4,5,6|")
+if columns.records() != EntityRecord.parse("1,COW,1,2,3||2,PIG,4,5,6|"):
+    print("***** ERROR: entity columns and records differ: " + str(columns.records()))
+elif verbose:
+    print("entity columns: " + str(columns.records()))
+
+server = StandInServer(port = 0).start()
+mc = Minecraft.create("localhost", port = server.port, timeout = 5.0)
+server.hitBlock(1, 2, 3)
+server.hitBlock(4, 5, 6, face = 2)
+hits = CmdEvents.pollBlockHits(mc.conn, array = True)
+if [(int(h.x), int(h.y), int(h.z), int(h.face)) for h in hits] != [(1, 2, 3, 1), (4, 5, 6, 2)]:
+    print("***** ERROR: pollBlockHits(array = True) returned " + str(hits))
+elif verbose:
+    print("polled " + str(len(hits)) + " hits into an array")
+mc.conn.close()
+server.stop()
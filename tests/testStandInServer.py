@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+from mcpython.minecraft import Minecraft
+from mcpython.minecraft import CmdEntity
+from mcpython.minecraft import CmdPlayer
+from mcpython.server import StandInServer
+
+# Runs offline against the in-memory stand-in server, no Minecraft needed.
+
+verbose = True
+
+server = StandInServer(port = 0, players = ("steve", "alex")).start()
+mc = Minecraft.create("localhost", port = server.port)
+
+if verbose:
+    print()
+    print("BLOCKS")
+    print()
+
+mc.setBlock(1, 2, 3, "STONE")
+block = mc.getBlock(1, 2, 3)
+if block != "STONE":
+    print("***** ERROR: block was set to STONE but is actually: " + block)
+mc.setStairs(5, 5, 5, "OAK_STAIRS", "north", "straight", "bottom")
+data = mc.getBlockWithData(5, 5, 5)
+if data != "minecraft:oak_stairs[facing=north,half=bottom,shape=straight]":
+    print("***** ERROR: unexpected block data: " + data)
+mc.setBlocks(0, 10, 0, 2, 11, 2, "DIRT")
+blocks = list(mc.getBlocks(0, 10, 0, 2, 11, 2))
+if blocks != ["DIRT"] * 18:
+    print("***** ERROR: setBlocks/getBlocks returned " + str(blocks))
+height = mc.getHeight(0, 0)
+if height != 11:
+    print("***** ERROR: height should be 11 but is " + str(height))
+elif verbose:
+    print("set and read back " + str(len(blocks) + 2) + " blocks")
+
+if verbose:
+    print()
+    print("PLAYERS AND ENTITIES")
+    print()
+
+alex = CmdPlayer(mc.conn, "alex")
+alex.setPos(10, 20, 30)
+pos = alex.getPos()
+if (pos.x, pos.y, pos.z) != (10, 20, 30):
+    print("***** ERROR: player pos was set to 10, 20, 30 but is actually: " + str(pos))
+cowId = mc.spawnEntity((12, 20, 30), "COW", baby = True)
+cow = CmdEntity(mc.conn, cowId)
+if cow.isAdult():
+    print("***** ERROR: spawned a baby cow but it is an adult")
+cow.setAdult()
+if not cow.isAdult():
+    print("***** ERROR: cow should be an adult now")
+nearby = alex.getEntities(distance = 5)
+if [e[0] for e in nearby] != [cowId]:
+    print("***** ERROR: expected only the cow near alex, got " + str(nearby))
+elif verbose:
+    print("found entity " + str(cowId) + " of type " + nearby[0][1] + " near alex")
+
+if verbose:
+    print()
+    print("EVENTS")
+    print()
+
+server.hitBlock(1, 2, 3, player = "alex")
+server.postChat("steve", "hello, world")
+hits = alex.pollBlockHits()
+if len(hits) != 1 or hits[0].entityId != alex.id:
+    print("***** ERROR: expected one block hit by alex, got " + str(hits))
+posts = CmdPlayer(mc.conn).pollChatPosts()
+if len(posts) != 1 or posts[0].message != "hello, world":
+    print("***** ERROR: expected one chat post, got " + str(posts))
+elif verbose:
+    print("polled " + str(hits) + " and " + str(posts))
+mc.postToChat("Score: 3, 4 (final)\nwell played")
+mc.getPlayerEntityIds()
+if server.chatLog[-2:] != ["Score: 3, 4 (final)", "well played"]:
+    print("***** ERROR: chat text was changed on the way: " + str(server.chatLog[-2:]))
+elif verbose:
+    print("posted " + str(server.chatLog[-2:]))
+
+if server.errors:
+    print("***** ERROR: the server failed on " + str(server.errors))
+
+mc.conn.close()
+server.stop()
+print("done")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+from mcpython.connection import RequestTimeout
+from mcpython.minecraft import Minecraft
+from mcpython.server import StandInServer
+
+# Runs offline against a stand-in server that can be made slow or drop the
+# connection: request timeouts, automatic reconnection and rate control.
+
+verbose = True
+
+class SlowServer(StandInServer):
+    """Sleeps before answering getHeight, takes delay seconds per setBlock and drops the
+    connection, without running it, at the first setBlock of x == dropAt"""
+    def __init__(self, **options):
+        StandInServer.__init__(self, **options)
+        self.heightDelay = 0.0
+        self.delay = 0.0
+        self.dropAt = None
+
+    def handle(self, line):
+        if line.startswith("world.getHeight("):
+            time.sleep(self.heightDelay)
+        elif line.startswith("world.setBlock("):
+            time.sleep(self.delay)
+            if self.dropAt is not None and line.startswith("world.setBlock(%d,"%self.dropAt):
+                self.dropAt = None
+                # ends the handler thread, which closes the socket
+                raise SystemExit()
+        return StandInServer.handle(self, line)
+
+server = SlowServer(port = 0).start()
+mc = Minecraft.create("localhost", port = server.port, timeout = 5.0)
+
+if verbose:
+    print()
+    print("TIMEOUTS")
+    print()
+
+server.heightDelay = 0.5
+start = time.perf_counter()
+try:
+    mc.withTimeout(0.1).getHeight(0, 0)
+    print("***** ERROR: a reply that takes 0.5s did not time out after 0.1s")
+except RequestTimeout:
+    if time.perf_counter() - start > 0.4:
+        print("***** ERROR: the timeout was raised late")
+mc.setBlock(1, 1, 1, "GOLD_BLOCK")
+block = mc.getBlock(1, 1, 1)
+if block != "GOLD_BLOCK":
+    print("***** ERROR: the call after a timeout got the wrong reply: " + str(block))
+elif verbose:
+    print("timed out after 0.1s, the next call still got its own reply")
+pending = mc.conn.sendPipelined(b"world.getHeight", 0, 0)
+pending.cancel()
+server.heightDelay = 0.0
+heights = [mc.getHeight(0, 0) for _ in range(3)]
+if mc.getBlock(1, 1, 1) != "GOLD_BLOCK" or heights != [heights[0]] * 3:
+    print("***** ERROR: replies were mismatched after a cancelled request")
+elif verbose:
+    print("cancelled a request, its late reply was discarded")
+
+# threads sharing the connection, some of them timing out
+server.heightDelay = 0.05
+errors = []
+
+def worker(n):
+    for i in range(20):
+        try:
+            mc.withTimeout(0.01).getHeight(n, i)
+        except RequestTimeout:
+            pass
+        mc.setBlock(n, 2, i, "STONE" if (n + i) % 2 else "DIRT")
+        block = mc.getBlock(n, 2, i)
+        if block != ("STONE" if (n + i) % 2 else "DIRT"):
+            errors.append((n, i, block))
+
+threads = [threading.Thread(target = worker, args = (n,)) for n in range(4)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+server.heightDelay = 0.0
+if errors:
+    print("***** ERROR: threads got each other's replies: " + str(errors[:5]))
+elif verbose:
+    print("4 threads with timeouts each got their own replies")
+
+if verbose:
+    print()
+    print("RECONNECT")
+    print()
+
+mc.conn.autoReconnect(backoff = 0.05)
+server.dropAt = 14
+for x in range(10, 20):
+    mc.setBlock(x, 3, 0, "GOLD_BLOCK")
+blocks = list(mc.getBlocks(10, 3, 0, 19, 3, 0))
+if blocks != ["GOLD_BLOCK"] * 10:
+    print("***** ERROR: writes lost to the dropped connection: " + str(blocks))
+elif mc.conn.reconnects != 1:
+    print("***** ERROR: expected one reconnect, got " + str(mc.conn.reconnects))
+elif verbose:
+    print("the connection was dropped and the unacknowledged writes were sent again")
+
+# a reply must not acknowledge writes sent after its request
+mc.conn.autoReconnect(backoff = 0.05, outboxSize = 5)
+server.heightDelay = 0.3
+pending = mc.conn.sendPipelined(b"world.getHeight", 0, 0)
+for x in range(8):
+    mc.setBlock(x, 3, 1, "STONE")
+pending.result()
+server.heightDelay = 0.0
+if len(mc.conn.outbox) != 5:
+    print("***** ERROR: " + str(5 - len(mc.conn.outbox)) + " unacknowledged writes left the outbox")
+mc.getPlayerEntityIds()
+
+if verbose:
+    print()
+    print("RATE CONTROL")
+    print()
+
+limiter = mc.conn.rateLimit(probeInterval = 0.05, minRate = 50)
+limiter.setCeiling("world.setBlock", 100)
+start = time.perf_counter()
+for x in range(50):
+    mc.setBlock(x, 4, 0, "STONE")
+elapsed = time.perf_counter() - start
+if elapsed < 0.4:
+    print("***** ERROR: 50 setBlocks at 100 per second took only " + str(elapsed) + "s")
+limiter.setCeiling("world.setBlock", None)
+server.delay = 0.005
+rate = limiter.rate
+for x in range(150):
+    mc.setBlock(x, 5, 0, "STONE")
+mc.getPlayerEntityIds()
+server.delay = 0.0
+if limiter.decreases == 0 or limiter.rate >= rate:
+    print("***** ERROR: the rate did not come down for a slow server: " + str(limiter.rate))
+elif verbose:
+    print("rate went from " + str(int(rate)) + " to " + str(int(limiter.rate)) + " per second for a slow server")
+mc.conn.rateLimit(False)
+mc.conn.close()
+server.stop()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import random
+
+from mcpython.minecraft import Minecraft
+from mcpython.server import StandInServer
+
+# Runs offline against the in-memory stand-in server: reads answered by the world
+# cache must always agree with the server, whatever was written, pipelined or
+# restored in between.  A second connection without a cache reads the truth, once
+# a round trip on the first one shows its writes have been processed.
+
+verbose = True
+random.seed(3)
+materials = ["STONE", "DIRT", "AIR", "GOLD_BLOCK"]
+
+def real(name, *args):
+    """A read through the uncached connection, once mc's writes have been processed"""
+    mc.getPlayerEntityIds()
+    return getattr(truth, name)(*args)
+
+def check(what, cached, truth):
+    if cached != truth:
+        print("***** ERROR: " + what + ": cached " + str(cached) + " but the server has " + str(truth))
+        return False
+    return True
+
+for options in ({}, {"prefetch": True}):
+    server = StandInServer(port = 0).start()
+    mc = Minecraft.create("localhost", port = server.port, timeout = 5.0)
+    truth = Minecraft.create("localhost", port = server.port, timeout = 5.0)
+    cache = mc.cacheWorld(ttl = None, **options)
+
+    errors = 0
+    # a read pipelined before a write must not be cached after the write
+    mc.setBlock(1, 5, 1, "STONE")
+    p = mc.pipeline()
+    read = p.getBlock(1, 5, 1)
+    height = p.getHeight(1, 1)
+    mc.setBlock(1, 5, 1, "GOLD_BLOCK")
+    mc.setBlock(1, 9, 1, "GOLD_BLOCK")
+    read.result()
+    height.result()
+    errors += not check("getBlock after a pipelined read", mc.getBlock(1, 5, 1), real("getBlock", 1, 5, 1))
+    errors += not check("getHeight after a pipelined read", mc.getHeight(1, 1), real("getHeight", 1, 1))
+
+    # restoring a checkpoint changes blocks no write named
+    mc.setBlock(2, 5, 2, "STONE")
+    mc.saveCheckpoint()
+    mc.setBlock(2, 5, 2, "GOLD_BLOCK")
+    mc.getBlock(2, 5, 2)
+    mc.restoreCheckpoint()
+    errors += not check("getBlock after restoring a checkpoint", mc.getBlock(2, 5, 2), real("getBlock", 2, 5, 2))
+
+    # random writes, reads and pipelined reads
+    for _ in range(300):
+        x, y, z = random.randint(0, 20), random.randint(0, 8), random.randint(0, 20)
+        r = random.random()
+        if r < 0.3:
+            mc.setBlock(x, y, z, random.choice(materials))
+        elif r < 0.4:
+            mc.setBlocks(x, y, z, x + random.randint(0, 4), y + random.randint(0, 2), z + random.randint(0, 4),
+                         random.choice(materials))
+        elif r < 0.5:
+            states = mc.getBlockStates([(x, y, z), (x + 1, y, z)])
+            errors += not check("getBlockStates", [s.string for s in states],
+                                [real("getBlockWithData", x, y, z), real("getBlockWithData", x + 1, y, z)])
+        elif r < 0.6:
+            heights = mc.getHeightMap(x, z, x + 3, z + 3)
+            errors += not check("getHeightMap", heights.tolist(),
+                                [[real("getHeight", i, k) for k in range(z, z + 4)] for i in range(x, x + 4)])
+        elif r < 0.7:
+            errors += not check("getHeight", mc.getHeight(x, z), real("getHeight", x, z))
+        else:
+            errors += not check("getBlock", mc.getBlock(x, y, z), real("getBlock", x, y, z))
+    if verbose and not errors:
+        print("options " + str(options) + ": cached reads agree with the server, " + str(cache.stats()))
+    mc.conn.close()
+    truth.conn.close()
+    server.stop()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import random
+import time
+
+from mcpython.minecraft import Minecraft
+from mcpython.server import StandInServer
+
+# Runs offline against the in-memory stand-in server: writes dropped or cut down by
+# the write filter must leave the same world behind as writes sent as they are.
+# A second connection without a filter reads the truth, once a round trip on the
+# first one shows its writes have been processed.
+
+verbose = True
+random.seed(4)
+materials = ["STONE", "DIRT", "AIR", "GOLD_BLOCK"]
+edits = [("saveCheckpoint", ())]
+for _ in range(400):
+    x, y, z = random.randint(0, 12), random.randint(0, 6), random.randint(0, 12)
+    r = random.random()
+    if r < 0.5:
+        edits.append(("setBlock", (x, y, z, random.choice(materials))))
+    elif r < 0.75:
+        edits.append(("setBlocks", (x, y, z, x + random.randint(0, 4), y + random.randint(0, 2),
+                                    z + random.randint(0, 4), random.choice(materials))))
+    elif r < 0.97:
+        edits.append(("getBlock", (x, y, z)))
+    else:
+        edits.append(("restoreCheckpoint", ()))
+
+def real(name, *args):
+    """A read through the unfiltered connection, once mc's writes have been processed"""
+    mc.getPlayerEntityIds()
+    return getattr(truth, name)(*args)
+
+def build(filtered, cacheWorld):
+    server = StandInServer(port = 0).start()
+    mc = Minecraft.create("localhost", port = server.port, timeout = 5.0)
+    writes = mc.filterWrites() if filtered else None
+    if cacheWorld:
+        mc.cacheWorld(ttl = None)
+    for name, args in edits:
+        getattr(mc, name)(*args)
+    world = list(mc.getBlocks(0, 0, 0, 16, 8, 16))
+    mc.conn.close()
+    server.stop()
+    return world, writes
+
+direct, _ = build(False, False)
+
+for cacheWorld in (False, True):
+    server = StandInServer(port = 0).start()
+    mc = Minecraft.create("localhost", port = server.port, timeout = 5.0)
+    truth = Minecraft.create("localhost", port = server.port, timeout = 5.0)
+    writes = mc.filterWrites()
+    if cacheWorld:
+        mc.cacheWorld(ttl = None)
+
+    # restoring a checkpoint changes blocks the filter remembers
+    mc.setBlock(2, 5, 2, "STONE")
+    mc.saveCheckpoint()
+    mc.setBlock(2, 5, 2, "GOLD_BLOCK")
+    mc.restoreCheckpoint()
+    mc.setBlock(2, 5, 2, "GOLD_BLOCK")
+    if real("getBlock", 2, 5, 2) != "GOLD_BLOCK":
+        print("***** ERROR: a write after restoring a checkpoint was dropped")
+
+    # a write after a pipelined read of the old block
+    p = mc.pipeline()
+    read = p.getBlock(3, 5, 3)
+    mc.setBlock(3, 5, 3, "DIRT")
+    read.result()
+    mc.setBlock(3, 5, 3, "AIR")
+    if real("getBlock", 3, 5, 3) != "AIR":
+        print("***** ERROR: a write after a pipelined read was dropped")
+
+    # a block read with getBlock may have state properties a setBlock resets
+    mc.setStairs(1, 1, 1, "OAK_STAIRS", "NORTH", "STRAIGHT", "TOP")
+    mc.getBlock(1, 1, 1)
+    mc.setBlock(1, 1, 1, "OAK_STAIRS")
+    if "half=top" in real("getBlockWithData", 1, 1, 1):
+        print("***** ERROR: a setBlock resetting the state of stairs was dropped")
+    mc.setBlock(4, 1, 4, "STONE")
+    mc.setBlocks(4, 1, 5, 5, 1, 5, "STONE")
+    mc.conn.close()
+    mc = Minecraft.create("localhost", port = server.port, timeout = 5.0)
+    writes = mc.filterWrites()
+    if cacheWorld:
+        mc.cacheWorld(ttl = None)
+    mc.getBlockWithData(4, 1, 4)
+    mc.getBlockStates([(4, 1, 5), (5, 1, 5)])
+    suppressed = writes.suppressed
+    mc.setBlock(4, 1, 4, "STONE")
+    mc.setBlocks(4, 1, 5, 5, 1, 5, "STONE")
+    if writes.suppressed - suppressed != (2 if cacheWorld else 0):
+        print("***** ERROR: cacheWorld=" + str(cacheWorld) + ": writes over blocks read without state properties: "
+              + str(writes.suppressed - suppressed) + " suppressed")
+
+    # a setBlocks too large to compare is sent without remembering every block
+    start = time.process_time()
+    writes.filter(b"world.setBlocks", (-400, 0, -400, 400, 100, 400, "AIR"))
+    elapsed = time.process_time() - start
+    if elapsed > 0.5:
+        print("***** ERROR: filtering an oversized setBlocks took " + str(elapsed) + "s")
+    mc.setBlocks(-25, 0, -25, 25, 20, 25, "AIR")
+    mc.setBlock(2, 5, 2, "GOLD_BLOCK")
+    if real("getBlock", 2, 5, 2) != "GOLD_BLOCK":
+        print("***** ERROR: a write after an oversized setBlocks was dropped")
+    mc.conn.close()
+    truth.conn.close()
+    server.stop()
+
+    # random writes, reads and checkpoint restores
+    world, writes = build(True, cacheWorld)
+    if world != direct:
+        print("***** ERROR: cacheWorld=" + str(cacheWorld) + ": the filtered writes built a different world")
+    elif verbose:
+        print("cacheWorld=" + str(cacheWorld) + ": same world, " + str(writes.stats()))